@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+analytics.py
+
+Pre-aggregated fraud analytics, so monitoring never scans fraud_logs.
+
+- Every blocked transfer is folded into the `fraud_rollups` collection at write
+  time: one $inc upsert per (granularity, dimension) pair - minute / hour / day
+  x all / user / location - sent as a single unordered bulk_write.
+- Each rollup document holds blocked count, amount sum / max, score sum and a
+  score histogram (SCORE_BIN_WIDTH wide bins), keyed by a deterministic _id.
+- query_rollups() reads a time range for one series: O(buckets), not O(events).
+
+Usage:
+    python analytics.py backfill   # rebuild fraud_rollups from fraud_logs
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "fraud_detection_db"
+ROLLUPS_COL = "fraud_rollups"
+FRAUD_LOGS_COL = "fraud_logs"
+
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+DIMENSIONS = ("all", "user", "location")
+SCORE_BIN_WIDTH = 0.05
+MAX_QUERY_BUCKETS = 5000
+
+_indexes_ready = False
+
+def bucket_start(ts, granularity):
+    if granularity == "minute":
+        return ts.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def parse_utc(value):
+    """ISO-8601 string -> naive UTC datetime, the form buckets are stored in; ValueError if invalid."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+def score_bin(score):
+    """Lower edge of the histogram bin as a field-safe key, e.g. 0.87 -> "85"."""
+    b = min(int(float(score) / SCORE_BIN_WIDTH + 1e-9), int(round(1 / SCORE_BIN_WIDTH)) - 1)
+    return f"{int(round(b * SCORE_BIN_WIDTH * 100)):02d}"
+
+def ensure_indexes(col):
+    global _indexes_ready
+    if not _indexes_ready:
+        col.create_index([("granularity", 1), ("dim", 1), ("key", 1), ("bucket", 1)])
+        _indexes_ready = True
+
+def rollup_ops(user_id, location, amount, score, ts):
+    ops = []
+    keys = {"all": "*", "user": str(user_id or ""), "location": str(location or "")}
+    hist_field = f"score_hist.{score_bin(score)}"
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(ts, granularity)
+        for dim in DIMENSIONS:
+            key = keys[dim]
+            _id = f"{granularity}|{bucket.isoformat()}|{dim}|{key}"
+            ops.append(UpdateOne(
+                {"_id": _id},
+                {
+                    "$setOnInsert": {"granularity": granularity, "dim": dim, "key": key, "bucket": bucket},
+                    "$inc": {"blocked": 1, "amount_sum": float(amount), "score_sum": float(score), hist_field: 1},
+                    "$max": {"amount_max": float(amount)},
+                },
+                upsert=True,
+            ))
+    return ops
+
+def record_blocked(col, user_id, location, amount, score, ts=None):
+    """Fold one blocked transfer into every rollup series (one round trip)."""
+    ensure_indexes(col)
+    col.bulk_write(rollup_ops(user_id, location, amount, score, ts or datetime.utcnow()), ordered=False)
+
+def query_rollups(col, granularity="hour", dim="all", key="*", start=None, end=None):
+    """Rollup buckets for one series in [start, end), oldest first, with mean score added."""
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {sorted(GRANULARITIES)}")
+    if dim not in DIMENSIONS:
+        raise ValueError(f"dim must be one of {list(DIMENSIONS)}")
+    end = end or datetime.utcnow()
+    start = start or end - GRANULARITIES[granularity] * 60
+    if (end - start) / GRANULARITIES[granularity] > MAX_QUERY_BUCKETS:
+        raise ValueError(f"range too large: more than {MAX_QUERY_BUCKETS} {granularity} buckets")
+    # sort as an argument, not .sort(): a GuardedCollection returns the documents as a list
+    docs = col.find(
+        {"granularity": granularity, "dim": dim, "key": "*" if dim == "all" else key,
+         "bucket": {"$gte": bucket_start(start, granularity), "$lt": end}},
+        {"_id": 0, "granularity": 0, "dim": 0, "key": 0},
+        sort=[("bucket", 1)],
+    )
+    out = []
+    for doc in docs:
+        doc["bucket"] = doc["bucket"].isoformat()
+        doc["score_mean"] = doc.get("score_sum", 0.0) / doc["blocked"] if doc.get("blocked") else None
+        out.append(doc)
+    return out
+
+def backfill(db, batch_size=1000):
+    """Rebuild rollups from the raw fraud_logs (one-off / after changing bins)."""
+    col = db[ROLLUPS_COL]
+    col.drop()
+    global _indexes_ready
+    _indexes_ready = False
+    ensure_indexes(col)
+    ops, n = [], 0
+    for log in db[FRAUD_LOGS_COL].find({}, {"user_id": 1, "location": 1, "amount": 1, "model_fraud_prob": 1, "time": 1}):
+        ops.extend(rollup_ops(log.get("user_id"), log.get("location"), log.get("amount", 0.0),
+                              log.get("model_fraud_prob", 0.0), log.get("time") or datetime.utcnow()))
+        n += 1
+        if len(ops) >= batch_size:
+            col.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        col.bulk_write(ops, ordered=False)
+    return n
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] != "backfill":
+        print(__doc__)
+        sys.exit(1)
+    from pymongo import MongoClient
+    n = backfill(MongoClient(MONGO_URI)[DB_NAME])
+    print(f"[OK] Rolled up {n} fraud_logs entries into {ROLLUPS_COL}")
+
+if __name__ == "__main__":
+    main()
@@ -152,11 +152,12 @@ if (window.location.pathname.endsWith("dashboard.html")){
   function showFraudBanner(serverAlerts){
     const banner = id("fraud_banner"); if(!banner) return;
     banner.classList.remove("hidden");
-    // serverAlerts expected: {risk_score:0.95, location_for_message: "..."}
+    // serverAlerts expected: {risk_score:0.95, reason: "...", location_for_message: "..."}
     const pct = Math.round((serverAlerts && serverAlerts.risk_score || 0) * 100);
     id("fraud_msg").textContent = `⚠️ AI flagged this transaction as suspicious (RISK SCORE: ${pct}% ).`;
     const loc = serverAlerts && serverAlerts.location_for_message ? serverAlerts.location_for_message : "-";
-    id("fraud_details").textContent = `Unknown device & Unknown IP address at location ${loc} — Transaction not possible.`;
+    const reason = serverAlerts && serverAlerts.reason ? serverAlerts.reason : "High model risk";
+    id("fraud_details").textContent = `${reason} at location ${loc} — Transaction not possible.`;
   }
   function hideFraudBanner(){ const b=id("fraud_banner"); if(b) b.classList.add("hidden"); }
 
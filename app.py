@@ -5,13 +5,25 @@ Updated backend with exact rule set per user's specification.
 - Applies deterministic rule-based fraud probabilities per cases provided.
 - If model exists, final_score = max(rule_score, model_score) (conservative).
 """
-import os, uuid, hashlib, random, string
+import os, uuid, hashlib, hmac, random, string, threading, time
+from collections import OrderedDict
+from functools import wraps
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, send_from_directory
+from contextlib import nullcontext
+from flask import Flask, request, jsonify, send_from_directory, g, Response
 from flask_cors import CORS
-from pymongo import MongoClient
+from mongo_conn import make_client, CircuitBreaker, GuardedDatabase, DatabaseUnavailable
 import pickle
-import pandas as pd
+from shadow import load_shadow_scorer
+from pipeline import BLOCK_THRESHOLD, DEFAULT_BACKEND, bundle_path, load_bundle, build_bundle, preprocess
+from analytics import ROLLUPS_COL, record_blocked, query_rollups, parse_utc
+from rate_limit import TokenBucketLimiter
+from feature_cache import FEATURES_VERSION_FIELD, FeatureSliceCache
+from geo import GeoIndex
+from ip_reputation import ReputationIndex
+from membership import KNOWN_DEVICES_FIELD, KNOWN_IPS_FIELD, is_known, increment_ops
+from profiling import StageTimer, SlowRequestLog, StackSampler
+from explain import build_explainer, risk_factors  # numpy is only imported when an explainer is built
 
 # CONFIG
 MONGO_URI = "mongodb://localhost:27017/"
@@ -19,6 +31,18 @@ DB_NAME = "fraud_detection_db"
 USERS_COL = "users"
 RESET_OTP_TTL_SECONDS = 10
 TRANSFER_OTP_TTL_SECONDS = 20
+# FRAUD_FAST_STARTUP=1 defers pandas and the model pickles to a background warm-up
+# thread; transfers are scored by rules only until /api/ready reports ready.
+FAST_STARTUP = os.environ.get("FRAUD_FAST_STARTUP", "0") == "1"
+# Optional candidate model scored off the request path (see shadow.py)
+SHADOW_MODEL_PATH = os.environ.get("FRAUD_SHADOW_MODEL", "")
+# which trained pipeline to serve: random_forest (default), hist_gb or logistic (see model_backends.py)
+MODEL_BACKEND = os.environ.get("FRAUD_MODEL_BACKEND", DEFAULT_BACKEND)
+# shared secret for /api/admin/* and /api/analytics/* (X-Admin-Token header); unset = disabled
+ADMIN_TOKEN = os.environ.get("FRAUD_ADMIN_TOKEN", "")
+# in-memory fallbacks used while MongoDB is unavailable (see mongo_conn.py)
+SESSION_CACHE_MAX = 10000
+SESSION_CACHE_TTL_SECONDS = 300
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FRONTEND_DIR = os.path.join(BASE_DIR, "..", "frontend")
@@ -27,9 +51,15 @@ FRONTEND_DIR = os.path.abspath(FRONTEND_DIR)
 app = Flask(__name__, static_folder=FRONTEND_DIR, static_url_path="/")
 CORS(app)
 
-client = MongoClient(MONGO_URI)
-db = client[DB_NAME]
-users = db[USERS_COL]
+def connect_mongo():
+    """Pool-sized client with op deadlines; one circuit breaker per process."""
+    global client, db, users, mongo_breaker
+    client = make_client(MONGO_URI)
+    mongo_breaker = CircuitBreaker()
+    db = GuardedDatabase(client[DB_NAME], mongo_breaker)
+    users = db[USERS_COL]
+
+connect_mongo()
 
 ALLOWED_LOCATIONS = [
     "Pimpri-Chinchwad","Hyderabad","Ahmedabad","Bengaluru","Bhopal","Chennai",
@@ -37,6 +67,18 @@ ALLOWED_LOCATIONS = [
     "Vadodara","Visakhapatnam","Patna","Jaipur","Thane","Pune"
 ]
 
+# city distance matrix + IP-range -> city index (see geo.py)
+IP_LOCATIONS_PATH = os.path.join(BASE_DIR, "ip_locations.csv")
+geo_index = GeoIndex(ALLOWED_LOCATIONS, IP_LOCATIONS_PATH)
+# mmap'd blocklist/allowlist ranges; rebuilt automatically when the list files change
+ip_reputation = ReputationIndex()
+
+def ip_flagged(ip_choice, resolved_ip):
+    """IP_Address_Flagged: dashboard sent "unknown", or the IP is on the blocklist."""
+    if str(ip_choice).strip().lower() == "unknown":
+        return 1
+    return 1 if ip_reputation.is_flagged(resolved_ip) else 0
+
 # HELPERS
 def sha256_hash(s: str) -> str:
     return hashlib.sha256(s.encode()).hexdigest()
@@ -47,8 +89,104 @@ def gen_otp(length=6):
 def create_session_token():
     return str(uuid.uuid4())
 
+# per route/user/IP token buckets, checked before any MongoDB access (see rate_limit.py)
+rate_limiter = TokenBucketLimiter()
+
+def rate_limited(route):
+    """Reject with 429 when the caller's IP or user bucket for this route is empty."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            body = request.get_json(silent=True) or {}
+            user = str(body.get("user_id", "")).strip() or session_user_id(request.headers.get("Authorization"))
+            wait = rate_limiter.check(route, ip=request.remote_addr, user=user)
+            if wait:
+                resp = jsonify({"ok": False, "msg": "Too many requests, please retry later"})
+                resp.headers["Retry-After"] = str(max(1, int(wait + 0.999)))
+                return resp, 429
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def is_admin_request():
+    supplied = request.headers.get("X-Admin-Token", "")
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(supplied, ADMIN_TOKEN)
+
+# per-request stage timing, slow-request ring buffer and on-demand stack sampling (see profiling.py)
+slow_requests = SlowRequestLog()
+stack_sampler = StackSampler()
+
+@app.before_request
+def start_request_timer():
+    g.stage_timer = StageTimer()
+    stack_sampler.enter(f"{request.method} {request.path}")
+
+@app.after_request
+def record_slow_request(resp):
+    timer = g.get("stage_timer")
+    # admin calls (a profile run lasts its whole duration) would push real slow requests out of the buffer
+    if timer is not None and not request.path.startswith("/api/admin/"):
+        slow_requests.record(request.method, request.path, resp.status_code, timer)
+    return resp
+
+@app.teardown_request
+def end_request_sampling(exc):
+    stack_sampler.leave()
+
+def request_stage(name):
+    """Time one phase of the current request for the slow-request breakdown."""
+    timer = g.get("stage_timer")
+    return timer.stage(name) if timer is not None else nullcontext()
+
+# DEGRADED MODE CACHES: token -> user_id, user_id -> last user doc read (the feature source)
+_session_cache = OrderedDict()
+_user_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def cache_user(u, token=None):
+    if not u:
+        return
+    now = time.monotonic()
+    with _cache_lock:
+        _user_cache[u["User_ID"]] = (u, now)
+        _user_cache.move_to_end(u["User_ID"])
+        if token:
+            _session_cache[token] = (u["User_ID"], now)
+            _session_cache.move_to_end(token)
+        for cache in (_user_cache, _session_cache):
+            while len(cache) > SESSION_CACHE_MAX:
+                cache.popitem(last=False)
+
+def cached_session_user(token):
+    with _cache_lock:
+        hit = _session_cache.get(token)
+        if not hit or time.monotonic() - hit[1] > SESSION_CACHE_TTL_SECONDS:
+            return None
+        entry = _user_cache.get(hit[0])
+    return entry[0] if entry else None
+
+def forget_session(token):
+    with _cache_lock:
+        _session_cache.pop(token, None)
+
+def session_user_id(token):
+    """
+    User_ID behind a session token, for per-user rate limits: keying on the token
+    itself would let a client reset its bucket by logging in again. Session cache
+    only - the limiter runs before any MongoDB access, so an unknown (or bogus)
+    token costs nothing and is limited by IP alone; the handler then rejects it or
+    validates it, which caches it for the next request.
+    """
+    if not token:
+        return None
+    with _cache_lock:
+        hit = _session_cache.get(token)
+    return hit[0] if hit else None
+
 def find_user(user_id):
-    return users.find_one({"User_ID": user_id})
+    u = users.find_one({"User_ID": user_id})
+    cache_user(u)
+    return u
 
 # MODEL LOADING (optional)
 def safe_load_pickle(path):
@@ -60,27 +198,128 @@ def safe_load_pickle(path):
             print(f"[WARN] Failed to load {path}: {e}")
     return None
 
-fraud_model = safe_load_pickle(os.path.join(BASE_DIR, "random_forest_model.pkl"))
-label_encoders = safe_load_pickle(os.path.join(BASE_DIR, "label_encoders.pkl")) or {}
-scalers = safe_load_pickle(os.path.join(BASE_DIR, "scalers.pkl")) or {}
-
-def preprocess_new_data(txn_dict: dict) -> pd.DataFrame:
-    df = pd.DataFrame([txn_dict])
-    for col, enc in label_encoders.items():
-        if col in df.columns:
-            vals = df[col].astype(str).tolist()
-            classes = getattr(enc, "classes_", [])
-            table = {c: i for i, c in enumerate(classes)}
-            df[col] = [table.get(v, -1) for v in vals]
-    for col, sc in scalers.items():
-        if col in df.columns:
+fraud_model = None
+shadow_scorer = None
+fraud_explainer = None
+pipeline_bundle = None
+# pre-encoded per-user account features, keyed on the features_version bumped with the balance
+feature_slices = FeatureSliceCache()
+MODEL_STATE = {
+    "ready": False,
+    "mode": "fast" if FAST_STARTUP else "eager",
+    "model_loaded": False,
+    "backend": MODEL_BACKEND,
+    "schema_checksum": None,
+    "load_seconds": None,
+    "error": None,
+}
+
+def preprocess_new_data(txn_dict: dict, partial=None):
+    # same encoding as training (pipeline.py), reindexed to the training column order
+    return preprocess(pipeline_bundle, txn_dict, partial)
+
+def load_pipeline_bundle():
+    """
+    The configured backend's pipeline bundle in one read; the default backend falls
+    back to the legacy model/encoder/scaler pickles.
+    """
+    path = bundle_path(MODEL_BACKEND)
+    try:
+        bundle = load_bundle(path)
+    except Exception as e:
+        print(f"[WARN] Failed to load {path}: {e}")
+        bundle = None
+    if bundle is not None or MODEL_BACKEND != DEFAULT_BACKEND:
+        if bundle is None:
+            print(f"[WARN] No pipeline for backend {MODEL_BACKEND}; serving rule-only scores")
+        return bundle
+    model = safe_load_pickle(os.path.join(BASE_DIR, "random_forest_model.pkl"))
+    if model is None:
+        return None
+    label_encoders = safe_load_pickle(os.path.join(BASE_DIR, "label_encoders.pkl")) or {}
+    scalers = safe_load_pickle(os.path.join(BASE_DIR, "scalers.pkl")) or {}
+    return build_bundle(model, label_encoders, scalers)
+
+def load_model_artifacts():
+    """
+    Import pandas, load the pipeline bundle and run one dummy prediction so the
+    first real request does not pay for sklearn's lazy imports.
+    fraud_model is published last: scoring code only checks fraud_model.
+    """
+    global fraud_model, shadow_scorer, fraud_explainer, pipeline_bundle
+    t0 = time.perf_counter()
+    try:
+        import pandas as pd  # noqa: F401  (deferred: slowest import on the startup path)
+        bundle = load_pipeline_bundle()
+        model = bundle["model"] if bundle is not None else None
+        if model is not None:
+            try:
+                model.predict_proba(preprocess(bundle, {}))
+            except Exception as e:
+                print(f"[WARN] model warm-up prediction failed: {e}")
+            MODEL_STATE["schema_checksum"] = bundle["schema_checksum"]
+        pipeline_bundle = bundle
+        if model is not None:
+            fraud_explainer = build_explainer(model, bundle["feature_columns"])
             try:
-                df[[col]] = sc.transform(df[[col]])
-            except Exception:
-                pass
-    if "Transaction_Time" in df.columns:
-        df = df.drop(["Transaction_Time"], axis=1)
-    return df
+                # optional: a broken candidate must never keep the live model from being published
+                shadow_scorer = load_shadow_scorer(SHADOW_MODEL_PATH, db["shadow_scores"])
+            except Exception as e:
+                print(f"[WARN] shadow scoring disabled: {e}")
+        fraud_model = model
+        MODEL_STATE["model_loaded"] = model is not None
+    except Exception as e:
+        MODEL_STATE["error"] = str(e)
+        print(f"[WARN] model warm-up failed, serving rule-only scores: {e}")
+    MODEL_STATE["load_seconds"] = round(time.perf_counter() - t0, 3)
+    MODEL_STATE["ready"] = True
+
+def user_feature_slice(u):
+    """(raw account features, partially encoded row) for u from the feature slice cache."""
+    return feature_slices.get(pipeline_bundle, u)
+
+def model_fraud_prob(features: dict, stage: str, partial=None):
+    """
+    Score one raw feature dict with fraud_model and mirror the same row to the shadow model.
+    partial: cached row with the account columns already encoded (see feature_cache.py)
+    returns: (model_prob, preprocessed row) - the row is reused for explanations
+    """
+    with request_stage("preprocess"):
+        df_txn = preprocess_new_data(features, partial)
+    with request_stage("predict"):
+        t0 = time.perf_counter()
+        model_prob = float(fraud_model.predict_proba(df_txn)[0][1])
+        live_ms = (time.perf_counter() - t0) * 1000
+    if shadow_scorer is not None:
+        shadow_scorer.submit(df_txn, model_prob, live_ms, {
+            "stage": stage,
+            "txn_id": features.get("Transaction_ID"),
+            "user_id": features.get("User_ID"),
+        }, features)
+    return model_prob, df_txn
+
+def explain_row(df_txn):
+    if fraud_explainer is None or df_txn is None:
+        return None
+    try:
+        return fraud_explainer.explain(df_txn)
+    except Exception as e:
+        print(f"[WARN] explanation failed: {e}")
+        return None
+
+def init_worker():
+    """
+    Reset per-process state after fork() (see serve.py): MongoClient pools are not
+    fork-safe and background threads do not survive fork. Model objects are kept.
+    """
+    connect_mongo()
+    if shadow_scorer is not None:
+        shadow_scorer.after_fork(db["shadow_scores"])
+
+if FAST_STARTUP:
+    threading.Thread(target=load_model_artifacts, name="model-warmup", daemon=True).start()
+else:
+    load_model_artifacts()
 
 # STATIC PAGES
 @app.route("/")
@@ -91,8 +330,16 @@ def index():
 def dashboard_html():
     return send_from_directory(FRONTEND_DIR, "dashboard.html")
 
+# READINESS
+@app.route("/api/ready", methods=["GET"])
+def api_ready():
+    # 503 while the warm-up thread is still loading; rule-only scoring is served meanwhile
+    data = dict(MODEL_STATE, mongo=mongo_breaker.snapshot())
+    return jsonify({"ok": MODEL_STATE["ready"], "data": data}), (200 if MODEL_STATE["ready"] else 503)
+
 # AUTH
 @app.route("/api/login", methods=["POST"])
+@rate_limited("login")
 def api_login():
     data = request.json or {}
     user_id = data.get("user_id", "").strip()
@@ -108,6 +355,7 @@ def api_login():
     token = create_session_token()
     expiry = datetime.utcnow() + timedelta(hours=2)
     users.update_one({"User_ID": user_id}, {"$set": {"session_token": token, "session_expiry": expiry}})
+    cache_user(dict(u, session_token=token, session_expiry=expiry), token)
 
     payload = {
         "token": token,
@@ -125,16 +373,35 @@ def api_login():
 def validate_session(token):
     if not token:
         return None
-    u = users.find_one({"session_token": token})
+    try:
+        u = users.find_one({"session_token": token})
+    except DatabaseUnavailable:
+        # degraded: trust the last snapshot of this session for scoring
+        u = cached_session_user(token)
+        if u is None:
+            # unknown here, not known to be invalid: 503 degraded rather than a 401 that logs the user out
+            raise
+        if "session_expiry" in u and u["session_expiry"] < datetime.utcnow():
+            return None
+        return u
     if not u:
+        forget_session(token)
         return None
     if "session_expiry" in u and u["session_expiry"] < datetime.utcnow():
+        forget_session(token)
         users.update_one({"_id": u["_id"]}, {"$unset": {"session_token": "", "session_expiry": ""}})
         return None
+    cache_user(u, token)
     return u
 
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    print(f"[WARN] {e}")
+    return jsonify({"ok": False, "msg": "Service temporarily degraded, please retry", "degraded": True}), 503
+
 # OTP endpoints (unchanged)
 @app.route("/api/request-otp", methods=["POST"])
+@rate_limited("request-otp")
 def api_request_otp():
     data = request.json or {}
     user_id = data.get("user_id", "").strip()
@@ -149,6 +416,7 @@ def api_request_otp():
     return jsonify({"ok": True, "msg": "OTP generated (demo)", "otp": otp, "ttl_seconds": RESET_OTP_TTL_SECONDS})
 
 @app.route("/api/verify-otp", methods=["POST"])
+@rate_limited("verify-otp")
 def api_verify_otp():
     data = request.json or {}
     user_id = data.get("user_id", "").strip()
@@ -179,11 +447,15 @@ def api_reset_password():
     return jsonify({"ok": True, "msg": "Password updated"})
 
 # Utility: determine rule-based fraud score per supplied combinations
-def compute_rule_fraud(override_location, device_choice, ip_choice, user_location, current_device, current_ip):
+def compute_rule_fraud(override_location, device_choice, ip_choice, user_location, current_device, current_ip,
+                       known_devices=None, known_ips=None):
     """
     device_choice, ip_choice: strings e.g. "-- keep current --", "Mobile", "unknown", "121.241.105.939"
     override_location: string from dashboard select (may be "-- keep current --")
     user_location: location stored in DB (string)
+    known_devices, known_ips: the user's membership counters (membership.py); a device/IP the
+        user has confirmed transfers from before counts as kept. Without them, only
+        current_device / current_ip count as kept.
     returns: (rule_prob, rule_flag_text)
     """
     # normalize
@@ -194,6 +466,13 @@ def compute_rule_fraud(override_location, device_choice, ip_choice, user_locatio
     device_unknown = (str(device_choice).strip().lower() == "unknown")
     ip_unknown = (str(ip_choice).strip().lower() == "unknown")
 
+    if not device_kept and not device_unknown:
+        known = is_known(known_devices, device_choice)
+        device_kept = known if known is not None else str(device_choice).strip() == str(current_device).strip()
+    if not ip_kept and not ip_unknown:
+        known = is_known(known_ips, ip_choice)
+        ip_kept = known if known is not None else str(ip_choice).strip() == str(current_ip).strip()
+
     location_changed = False
     if loc_kept:
         location_changed = False
@@ -255,9 +534,11 @@ def api_dashboard():
 
 # INITIATE TRANSFER
 @app.route("/api/initiate-transfer", methods=["POST"])
+@rate_limited("initiate-transfer")
 def api_initiate_transfer():
     token = request.headers.get("Authorization")
-    u = validate_session(token)
+    with request_stage("session"):
+        u = validate_session(token)
     if not u:
         return jsonify({"ok": False, "msg": "Invalid session"}), 401
     data = request.json or {}
@@ -283,37 +564,36 @@ def api_initiate_transfer():
     txn_location = override_location if override_location and override_location != "-- keep current --" else (u.get("location") or "")
 
     # compute rule-based fraud
-    rule_prob, rule_reason = compute_rule_fraud(override_location, device_choice, ip_choice, u.get("location",""), 
-                                               (u.get("recent_transactions",[{}])[0].get("Device_Type") if u.get("recent_transactions") else "Mobile"),
-                                               (u.get("recent_transactions",[{}])[0].get("IP_Address") if u.get("recent_transactions") else "127.0.0.1"))
+    with request_stage("rules"):
+        rule_prob, rule_reason = compute_rule_fraud(override_location, device_choice, ip_choice, u.get("location",""),
+                                                   (u.get("recent_transactions",[{}])[0].get("Device_Type") if u.get("recent_transactions") else "Mobile"),
+                                                   (u.get("recent_transactions",[{}])[0].get("IP_Address") if u.get("recent_transactions") else "127.0.0.1"),
+                                                   u.get(KNOWN_DEVICES_FIELD), u.get(KNOWN_IPS_FIELD))
     final_prob = float(rule_prob)
 
     # If model exists, compute model prob and take max
     if fraud_model is not None:
         try:
-            model_txn = {
-                "Transaction_ID": txn_id,
-                "User_ID": u["User_ID"],
-                "Transaction_Amount": amount,
-                "Transaction_Time": txn_time,
-                "Account_Balance": float(u.get("account_summary", {}).get("Total_Balance", 0.0) or 0.0),
-                "Device_Type": device_choice if device_choice and device_choice != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("Device_Type") or "Mobile"),
-                "Location": txn_location,
-                "Merchant_Category": "Transfer",
-                "IP_Address": ip_choice if ip_choice and ip_choice != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("IP_Address") or "127.0.0.1"),
-                "IP_Address_Flagged": 1 if str(ip_choice).strip().lower() == "unknown" else 0,
-                "Previous_Transaction_Amount": float(u.get("account_summary", {}).get("Spend_Analysis", {}).get("Outflow", 0.0) or 0.0),
-                "Daily_transaction_count": 1,
-                "Avg_Transaction_Amount_Per_Day": float(u.get("account_summary", {}).get("Spend_Analysis", {}).get("Inflow", 0.0) or 0.0),
-                "Avg_Transactions_amount_7Day": float(u.get("account_summary", {}).get("Spend_Analysis", {}).get("Outflow", 0.0) or 0.0),
-                "Failed_Transaction_Count_7d": 0,
-                "Card_Type": "Debit",
-                "Card_Age_Months": int(u.get("account_summary", {}).get("Card_Age_Months", 0) or 0),
-                "Transaction_Distance_KM": (426.78 if (override_location and override_location != u.get("location","")) else 5.0),
-                "Authentication_Method": "OTP"
-            }
-            df_txn = preprocess_new_data(model_txn)
-            model_prob = float(fraud_model.predict_proba(df_txn)[0][1])
+            with request_stage("features"):
+                txn_ip = ip_choice if ip_choice and ip_choice != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("IP_Address") or "127.0.0.1")
+                static_raw, partial_row = user_feature_slice(u)
+                model_txn = {
+                    **static_raw,
+                    "Transaction_ID": txn_id,
+                    "Transaction_Amount": amount,
+                    "Transaction_Time": txn_time,
+                    "Device_Type": device_choice if device_choice and device_choice != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("Device_Type") or "Mobile"),
+                    "Location": txn_location,
+                    "Merchant_Category": "Transfer",
+                    "IP_Address": txn_ip,
+                    "IP_Address_Flagged": ip_flagged(ip_choice, txn_ip),
+                    "Daily_transaction_count": 1,
+                    "Failed_Transaction_Count_7d": 0,
+                    "Card_Type": "Debit",
+                    "Transaction_Distance_KM": geo_index.transaction_distance_km(u.get("location",""), txn_location, txn_ip),
+                    "Authentication_Method": "OTP"
+                }
+            model_prob, _ = model_fraud_prob(model_txn, "initiate", partial_row)
             final_prob = max(final_prob, model_prob)
         except Exception as e:
             print(f"[WARN] model scoring at initiate failed: {e}")
@@ -338,7 +618,14 @@ def api_initiate_transfer():
         "device_choice": device_choice,
         "ip_choice": ip_choice
     }
-    users.update_one({"User_ID": u["User_ID"]}, {"$set": {"pending_transfer": pending}})
+    try:
+        with request_stage("save_pending"):
+            users.update_one({"User_ID": u["User_ID"]}, {"$set": {"pending_transfer": pending}})
+    except DatabaseUnavailable as e:
+        # scored from cached session/features, but the transfer cannot be staged
+        print(f"[WARN] pending transfer not saved: {e}")
+        return jsonify({"ok": False, "msg": "Service temporarily degraded, please retry", "degraded": True,
+                        "fraud_prob": float(final_prob), "rule_prob": float(rule_prob), "rule_reason": rule_reason}), 503
 
     resp = {
         "ok": True,
@@ -356,7 +643,8 @@ def api_initiate_transfer():
 @app.route("/api/confirm-transfer", methods=["POST"])
 def api_confirm_transfer():
     token = request.headers.get("Authorization")
-    u = validate_session(token)
+    with request_stage("session"):
+        u = validate_session(token)
     if not u:
         return jsonify({"ok": False, "msg": "Invalid session"}), 401
     data = request.json or {}
@@ -365,7 +653,8 @@ def api_confirm_transfer():
     if not entered_otp:
         return jsonify({"ok": False, "msg": "Provide otp"}), 400
 
-    u_latest = find_user(u["User_ID"])
+    with request_stage("load_user"):
+        u_latest = find_user(u["User_ID"])
     pending = u_latest.get("pending_transfer")
     if not pending:
         return jsonify({"ok": False, "msg": "No pending transfer"}), 400
@@ -386,31 +675,29 @@ def api_confirm_transfer():
 
     # recompute model if available and pick max
     final_prob = float(pending.get("fraud_prob", 0.0))
+    df_txn = None
     if fraud_model is not None:
         try:
-            txn_features = {
-                "Transaction_ID": pending.get("txn_id", ""),
-                "User_ID": u["User_ID"],
-                "Transaction_Amount": float(pending.get("amount", 0.0)),
-                "Transaction_Time": pending.get("override_time"),
-                "Account_Balance": float(u.get("account_summary", {}).get("Total_Balance", 0.0) or 0.0),
-                "Device_Type": pending.get("device_choice") if pending.get("device_choice") != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("Device_Type") or "Mobile"),
-                "Location": pending.get("override_location"),
-                "Merchant_Category": "Transfer",
-                "IP_Address": pending.get("ip_choice") if pending.get("ip_choice") != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("IP_Address") or "127.0.0.1"),
-                "IP_Address_Flagged": 1 if str(pending.get("ip_choice")).strip().lower() == "unknown" else 0,
-                "Previous_Transaction_Amount": float(u.get("account_summary", {}).get("Spend_Analysis", {}).get("Outflow", 0.0) or 0.0),
-                "Daily_transaction_count": 1,
-                "Avg_Transaction_Amount_Per_Day": float(u.get("account_summary", {}).get("Spend_Analysis", {}).get("Inflow", 0.0) or 0.0),
-                "Avg_Transactions_amount_7Day": float(u.get("account_summary", {}).get("Spend_Analysis", {}).get("Outflow", 0.0) or 0.0),
-                "Failed_Transaction_Count_7d": 0,
-                "Card_Type": "Debit",
-                "Card_Age_Months": int(u.get("account_summary", {}).get("Card_Age_Months", 0) or 0),
-                "Transaction_Distance_KM": (426.78 if (pending.get("override_location") and pending.get("override_location") != u.get("location","")) else 5.0),
-                "Authentication_Method": "OTP"
-            }
-            df_txn = preprocess_new_data(txn_features)
-            model_prob = float(fraud_model.predict_proba(df_txn)[0][1])
+            with request_stage("features"):
+                txn_ip = pending.get("ip_choice") if pending.get("ip_choice") != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("IP_Address") or "127.0.0.1")
+                static_raw, partial_row = user_feature_slice(u)
+                txn_features = {
+                    **static_raw,
+                    "Transaction_ID": pending.get("txn_id", ""),
+                    "Transaction_Amount": float(pending.get("amount", 0.0)),
+                    "Transaction_Time": pending.get("override_time"),
+                    "Device_Type": pending.get("device_choice") if pending.get("device_choice") != "-- keep current --" else (u.get("recent_transactions",[{}])[0].get("Device_Type") or "Mobile"),
+                    "Location": pending.get("override_location"),
+                    "Merchant_Category": "Transfer",
+                    "IP_Address": txn_ip,
+                    "IP_Address_Flagged": ip_flagged(pending.get("ip_choice"), txn_ip),
+                    "Daily_transaction_count": 1,
+                    "Failed_Transaction_Count_7d": 0,
+                    "Card_Type": "Debit",
+                    "Transaction_Distance_KM": geo_index.transaction_distance_km(u.get("location",""), pending.get("override_location"), txn_ip),
+                    "Authentication_Method": "OTP"
+                }
+            model_prob, df_txn = model_fraud_prob(txn_features, "confirm", partial_row)
             final_prob = max(final_prob, model_prob)
         except Exception as e:
             print(f"[WARN] model scoring failed at confirm: {e}")
@@ -429,20 +716,41 @@ def api_confirm_transfer():
         "location_for_message": message_loc
     }
 
-    if final_prob >= 0.8:
-        # log
-        db["fraud_logs"].insert_one({
-            "user_id": u_latest["User_ID"],
-            "amount": float(pending.get("amount", 0)),
-            "model_fraud_prob": float(final_prob),
-            "rule_prob": float(pending.get("rule_prob", 0.0)),
-            "time": datetime.utcnow()
-        })
-        users.update_one({"User_ID": u_latest["User_ID"]}, {"$unset": {"pending_transfer": ""}})
+    if final_prob >= BLOCK_THRESHOLD:
+        with request_stage("explain"):
+            explanation = explain_row(df_txn)
+        fraud_alerts["explanation"] = explanation
+        # log (best effort: a database brownout must not turn a block into an error)
+        try:
+            with request_stage("fraud_log"):
+                db["fraud_logs"].insert_one({
+                    "user_id": u_latest["User_ID"],
+                    "location": message_loc,
+                    "amount": float(pending.get("amount", 0)),
+                    "model_fraud_prob": float(final_prob),
+                    "rule_prob": float(pending.get("rule_prob", 0.0)),
+                    "rule_reason": pending.get("rule_reason", ""),
+                    "explanation": explanation,
+                    "time": datetime.utcnow()
+                })
+                record_blocked(db[ROLLUPS_COL], u_latest["User_ID"], message_loc, float(pending.get("amount", 0)), float(final_prob))
+        except DatabaseUnavailable as e:
+            print(f"[WARN] fraud log not written: {e}")
+        # separate call: a failed log write must not leave the blocked transfer pending
+        try:
+            users.update_one({"User_ID": u_latest["User_ID"]}, {"$unset": {"pending_transfer": ""}})
+        except DatabaseUnavailable as e:
+            print(f"[WARN] blocked transfer not cleared: {e}")
         # Create the standard message body per your format
         # Round percentages to whole numbers for display
         pct = int(round(final_prob * 100))
-        extra_msg = f" Unknown device & Unknown IP address at location {message_loc} — Transaction not possible."
+        reasons = [pending.get("rule_reason", "")] if pending.get("rule_prob", 0.0) > 0 else []
+        factors = risk_factors(explanation)
+        if factors:
+            reasons.append("model risk factors: " + ", ".join(factors))
+        reason_text = "; ".join(r for r in reasons if r) or "High model risk"
+        fraud_alerts["reason"] = reason_text
+        extra_msg = f" {reason_text} at location {message_loc} — Transaction not possible."
         resp = {"ok": False, "msg": f"⚠️ AI flagged this transaction as suspicious (RISK SCORE: {pct}% ).{extra_msg}", "fraud_prob": final_prob}
         resp["fraud_alerts"] = fraud_alerts
         return jsonify(resp), 403
@@ -456,6 +764,9 @@ def api_confirm_transfer():
         return jsonify({"ok": False, "msg": "Insufficient funds"}), 402
 
     new_total = total_bal - amt
+    recent = u_latest.get("recent_transactions") or [{}]
+    used_device = pending.get("device_choice") if pending.get("device_choice") not in (None, "", "-- keep current --") else recent[0].get("Device_Type")
+    used_ip = pending.get("ip_choice") if pending.get("ip_choice") not in (None, "", "-- keep current --") else recent[0].get("IP_Address")
     txn = {
         "Transaction_ID": pending.get("txn_id", ""),
         "type": "Transfer",
@@ -468,11 +779,14 @@ def api_confirm_transfer():
         "txn_id": pending.get("txn_id", "")
     }
 
-    users.update_one({"User_ID": u_latest["User_ID"]}, {
+    update = {
         "$set": {"account_summary.Total_Balance": new_total},
         "$push": {"recent_transactions": {"$each": [txn], "$position": 0}},
         "$unset": {"pending_transfer": ""}}
-    )
+    # the balance changed: bumping the version retires cached feature slices in every worker
+    update["$inc"] = {FEATURES_VERSION_FIELD: 1, **increment_ops(used_device, used_ip)}
+    with request_stage("apply_transfer"):
+        users.update_one({"User_ID": u_latest["User_ID"]}, update)
     return jsonify({"ok": True, "msg": "Transfer completed", "new_balance": new_total, "txn": txn})
 
 # LOGOUT
@@ -482,9 +796,60 @@ def api_logout():
     u = validate_session(token)
     if not u:
         return jsonify({"ok": False, "msg": "Invalid session"}), 401
+    forget_session(token)
     users.update_one({"User_ID": u["User_ID"]}, {"$unset": {"session_token": "", "session_expiry": ""}})
     return jsonify({"ok": True, "msg": "Logged out"})
 
+# ANALYTICS (pre-aggregated rollups, see analytics.py)
+@app.route("/api/analytics/fraud", methods=["GET"])
+def api_analytics_fraud():
+    if not is_admin_request():
+        return jsonify({"ok": False, "msg": "Admin token required"}), 403
+    args = request.args
+    try:
+        end = parse_utc(args["end"]) if args.get("end") else datetime.utcnow()
+        start = parse_utc(args["start"]) if args.get("start") else None
+        buckets = query_rollups(db[ROLLUPS_COL], args.get("granularity", "hour"), args.get("dim", "all"),
+                                args.get("key", "*"), start, end)
+    except ValueError as e:
+        return jsonify({"ok": False, "msg": str(e)}), 400
+    return jsonify({"ok": True, "data": buckets})
+
+# PROFILING (per process, see profiling.py)
+@app.route("/api/admin/profile", methods=["GET"])
+def api_admin_profile():
+    """Sample request-thread stacks for ?seconds= (default 10); collapsed-stack text for flame graphs."""
+    if not is_admin_request():
+        return jsonify({"ok": False, "msg": "Admin token required"}), 403
+    try:
+        seconds = float(request.args.get("seconds", 10))
+        interval_ms = float(request.args.get("interval_ms", 10))
+    except ValueError:
+        return jsonify({"ok": False, "msg": "seconds and interval_ms must be numbers"}), 400
+    result = stack_sampler.sample(seconds, interval_ms / 1000.0)
+    if result is None:
+        return jsonify({"ok": False, "msg": "A profile is already running in this worker"}), 409
+    text, samples = result
+    resp = Response(text, mimetype="text/plain")
+    resp.headers["X-Profile-Samples"] = str(samples)
+    resp.headers["X-Profile-Pid"] = str(os.getpid())
+    return resp
+
+@app.route("/api/admin/slow-requests", methods=["GET"])
+def api_admin_slow_requests():
+    if not is_admin_request():
+        return jsonify({"ok": False, "msg": "Admin token required"}), 403
+    try:
+        limit = int(request.args.get("limit", 0)) or None
+    except ValueError:
+        return jsonify({"ok": False, "msg": "limit must be an integer"}), 400
+    return jsonify({"ok": True, "data": {
+        "pid": os.getpid(),
+        "threshold_ms": slow_requests.threshold_ms,
+        "captured": slow_requests.captured,
+        "requests": slow_requests.recent(limit),
+    }})
+
 # DEMO USER HELPER (unchanged)
 @app.route("/api/demo-user", methods=["GET"])
 def api_demo_user():
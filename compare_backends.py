@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+compare_backends.py
+
+Trains every backend in model_backends.py on the same train/test split and
+reports what matters for serving:
+
+- single-row latency: predict_proba on one row, as app.py does per transfer (p50 / p99)
+- batch throughput: rows/s for predict_proba over the whole test set
+- artifact size: pickled model bytes
+- recall / precision on the fraud class at the block threshold (pipeline.BLOCK_THRESHOLD) and at 0.5
+
+Usage:
+    python compare_backends.py                      # all backends
+    python compare_backends.py --backends random_forest,hist_gb --rows 500
+    python compare_backends.py --save               # also write fraud_pipeline_<backend>.pkl for each
+"""
+import time
+import pickle
+import argparse
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import recall_score, precision_score
+
+from model_backends import BACKENDS, make_model
+from pipeline import BLOCK_THRESHOLD, bundle_path, fit_preprocessors, build_bundle, save_bundle
+
+def single_row_latency(model, X, n_rows):
+    times = []
+    for i in range(min(n_rows, len(X))):
+        row = X.iloc[[i]]
+        t0 = time.perf_counter()
+        model.predict_proba(row)
+        times.append(time.perf_counter() - t0)
+    return np.percentile(times, 50) * 1000, np.percentile(times, 99) * 1000
+
+def batch_throughput(model, X, repeats=3):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        model.predict_proba(X)
+        best = min(best, time.perf_counter() - t0)
+    return len(X) / best
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency / accuracy comparison of model backends")
+    ap.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated backend names")
+    ap.add_argument("--rows", type=int, default=200, help="rows used for single-row latency")
+    ap.add_argument("--save", action="store_true", help="write a pipeline bundle per backend")
+    args = ap.parse_args()
+
+    X_train = pd.read_csv('train_features.csv')
+    y_train = pd.read_csv('train_labels.csv').values.ravel()
+    X_test = pd.read_csv('test_features.csv')
+    y_test = pd.read_csv('test_labels.csv').values.ravel()
+    preprocessors = fit_preprocessors(pd.read_csv('DATASET.csv')) if args.save else None
+
+    results = []
+    for name in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        model = make_model(name)
+        t0 = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_s = time.perf_counter() - t0
+
+        proba = model.predict_proba(X_test)[:, 1]
+        p50, p99 = single_row_latency(model, X_test, args.rows)
+        res = {
+            "backend": name,
+            "fit_s": fit_s,
+            "row_p50_ms": p50,
+            "row_p99_ms": p99,
+            "batch_rows_per_s": batch_throughput(model, X_test),
+            "size_kb": len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL)) / 1024,
+            "recall@block": recall_score(y_test, proba >= BLOCK_THRESHOLD, zero_division=0),
+            "precision@block": precision_score(y_test, proba >= BLOCK_THRESHOLD, zero_division=0),
+            "recall@0.5": recall_score(y_test, proba >= 0.5, zero_division=0),
+        }
+        results.append(res)
+        if args.save:
+            bundle = build_bundle(model, *preprocessors, X_train.columns.tolist(), backend=name)
+            save_bundle(bundle, bundle_path(name))
+            print(f"Saved {bundle_path(name)}")
+
+    print("\n================ Backend comparison ================")
+    print(f"{'backend':<14} {'fit s':>7} {'row p50 ms':>11} {'row p99 ms':>11} {'batch rows/s':>13} "
+          f"{'size KB':>9} {'recall@' + format(BLOCK_THRESHOLD, 'g'):>11} {'prec@' + format(BLOCK_THRESHOLD, 'g'):>9} {'recall@0.5':>11}")
+    for r in results:
+        print(f"{r['backend']:<14} {r['fit_s']:7.1f} {r['row_p50_ms']:11.2f} {r['row_p99_ms']:11.2f} "
+              f"{r['batch_rows_per_s']:13.0f} {r['size_kb']:9.0f} {r['recall@block']:11.3f} "
+              f"{r['precision@block']:9.3f} {r['recall@0.5']:11.3f}")
+    print("\nServe a backend with FRAUD_MODEL_BACKEND=<backend> after writing its bundle "
+          "(train_random_forest.py --backend <backend>, or --save here).")
+
+if __name__ == "__main__":
+    main()
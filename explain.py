@@ -0,0 +1,143 @@
+"""
+explain.py
+
+Per-prediction feature attributions for the RandomForest, computed from the
+forest's own decision paths (Saabas path contributions):
+
+- At load time every node gets the change in fraud probability it causes
+  (p(node) - p(parent)), credited to the feature its parent split on. Summing
+  those down each root-to-leaf path gives every leaf a contribution vector
+  (one value per feature), stored as one row of a leaves x features matrix.
+- At prediction time each tree's `tree_.apply` gives the leaf the row reaches
+  (the same lookup as model.apply, without its joblib dispatch per call); the
+  explanation is the sum of those leaves' rows - no sparse decision_path matrices.
+- bias + sum(contributions) == the forest's predict_proba for the fraud class.
+
+Results are cached per feature vector (LRU), so repeated triage of the same
+transaction is a dict lookup. numpy is imported only when an explainer is built,
+so importing risk_factors costs nothing on the request path.
+"""
+import time
+from functools import lru_cache
+
+EXPLAIN_CACHE_SIZE = 4096
+TOP_K = 5
+
+class ForestExplainer:
+    def __init__(self, model, feature_names=None, cache_size=EXPLAIN_CACHE_SIZE):
+        import numpy as np
+        self.model = model
+        names = feature_names if feature_names is not None else getattr(model, "feature_names_in_", None)
+        if names is None:
+            names = [f"f{i}" for i in range(model.n_features_in_)]
+        self.feature_names = [str(n) for n in names]
+        n_features = len(self.feature_names)
+        classes = list(getattr(model, "classes_", [0, 1]))
+        fraud_idx = classes.index(1) if 1 in classes else len(classes) - 1
+
+        leaf_vectors, node_to_row = [], []
+        n_rows = 0
+        bias = 0.0
+        for est in model.estimators_:
+            t = est.tree_
+            value = t.value[:, 0, :]
+            # normalise: older sklearn stores (weighted) counts, newer stores fractions
+            p = value[:, fraud_idx] / np.maximum(value.sum(axis=1), 1e-12)
+            # cumulative contribution of the path from the root to each node, level by level
+            cum = np.zeros((t.node_count, n_features))
+            frontier = np.array([0])
+            while frontier.size:
+                split = frontier[t.children_left[frontier] >= 0]
+                kids_all = []
+                for children in (t.children_left, t.children_right):
+                    kids = children[split]
+                    cum[kids] = cum[split]
+                    cum[kids, t.feature[split]] += p[kids] - p[split]
+                    kids_all.append(kids)
+                frontier = np.concatenate(kids_all)
+            leaves = np.nonzero(t.children_left < 0)[0]
+            rows = np.full(t.node_count, -1, dtype=np.intp)
+            rows[leaves] = np.arange(n_rows, n_rows + leaves.size)
+            n_rows += leaves.size
+            leaf_vectors.append(cum[leaves])
+            node_to_row.append(rows)
+            bias += p[0]
+        self.leaf_contrib = np.concatenate(leaf_vectors)        # (total leaves, n_features)
+        # model.apply returns node ids per tree; offset them into one flat node -> leaf row table
+        self.node_to_row = np.concatenate(node_to_row)
+        self.tree_offsets = np.cumsum([0] + [r.size for r in node_to_row[:-1]])
+        self._trees = [est.tree_ for est in model.estimators_]
+        self.n_trees = len(model.estimators_)
+        self.bias = bias / self.n_trees
+        self._explain_cached = lru_cache(maxsize=cache_size)(self._explain_vector)
+
+    def _explain_vector(self, vector):
+        import numpy as np
+        X = np.asarray([vector], dtype=np.float32)  # trees split on float32 (sklearn's DTYPE)
+        leaves = np.fromiter((t.apply(X)[0] for t in self._trees), dtype=np.intp, count=self.n_trees)
+        contrib = self.leaf_contrib[self.node_to_row[self.tree_offsets + leaves]].sum(axis=0) / self.n_trees
+        order = np.argsort(-np.abs(contrib))[:TOP_K]
+        return {
+            "bias": float(self.bias),
+            "model_prob": float(self.bias + contrib.sum()),
+            "contributions": [
+                {"feature": self.feature_names[i], "contribution": float(contrib[i])}
+                for i in order if contrib[i] != 0.0
+            ],
+        }
+
+    def explain(self, df_row):
+        """Explain one preprocessed row (same columns the model was fitted on)."""
+        t0 = time.perf_counter()
+        if list(df_row.columns) != self.feature_names:
+            df_row = df_row.reindex(columns=self.feature_names, fill_value=0)
+        vector = tuple(float(v) for v in df_row.iloc[0].tolist())
+        result = dict(self._explain_cached(vector))
+        result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        return result
+
+def build_explainer(model, feature_names=None):
+    """
+    ForestExplainer for tree ensembles exposing estimators_[*].tree_, else None.
+    feature_names: the bundle's feature_columns, for models pickled without feature_names_in_
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None or not len(estimators) or not hasattr(estimators[0], "tree_"):
+        return None
+    try:
+        return ForestExplainer(model, feature_names)
+    except Exception as e:
+        print(f"[WARN] Failed to build forest explainer: {e}")
+        return None
+
+def risk_factors(explanation, limit=3):
+    """Names of the top features pushing the score towards fraud."""
+    if not explanation:
+        return []
+    return [c["feature"] for c in explanation["contributions"] if c["contribution"] > 0][:limit]
+
+def main():
+    """Time explanations of test rows against the served bundle: python explain.py [n_rows]"""
+    import sys
+    import numpy as np
+    import pandas as pd
+    from pipeline import load_bundle
+    bundle = load_bundle()
+    explainer = build_explainer(bundle["model"], bundle["feature_columns"]) if bundle is not None else None
+    if explainer is None:
+        print("[ERROR] No random_forest pipeline bundle; run train_random_forest.py")
+        sys.exit(1)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    X = pd.read_csv("test_features.csv", nrows=n)[explainer.feature_names]
+    times, worst = [], 0.0
+    for i in range(len(X)):
+        row = X.iloc[[i]]
+        t0 = time.perf_counter()
+        result = explainer._explain_vector(tuple(float(v) for v in row.iloc[0]))
+        times.append((time.perf_counter() - t0) * 1000)
+        worst = max(worst, abs(result["model_prob"] - bundle["model"].predict_proba(row)[0][1]))
+    print(f"{len(times)} uncached explanations: p50 {np.percentile(times, 50):.3f} ms, "
+          f"p99 {np.percentile(times, 99):.3f} ms; max |bias + sum - predict_proba| = {worst:.2e}")
+
+if __name__ == "__main__":
+    main()
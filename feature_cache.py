@@ -0,0 +1,68 @@
+"""
+feature_cache.py
+
+Per-user cache of the static part of the encoded model row.
+
+The account-derived fields (User_ID, Account_Balance, Previous_Transaction_Amount,
+both averages, Card_Age_Months) only change when a transfer changes the balance,
+yet every scoring call re-derived them from the user document and re-encoded /
+re-scaled them. This cache keeps, per user, the raw values (for the feature dict)
+and a partially encoded row in training column order, so pipeline.encode_row only
+fills in the per-transaction columns.
+
+Validity is a per-user version, not the data itself: api_confirm_transfer bumps
+FEATURES_VERSION_FIELD with the same $inc that changes the balance, so a hit is one
+dict lookup and two comparisons (schema checksum, version) with no lock. Every
+worker sees the bump on its next read of the user document. Anything else that
+rewrites account_summary must bump the field too (or the app be restarted).
+"""
+import threading
+
+from pipeline import encode_value
+
+FEATURES_VERSION_FIELD = "features_version"
+FEATURE_CACHE_MAX = 50000
+
+def static_features(u):
+    """Raw static feature values from a user document (same derivation app.py always used)."""
+    acct = u.get("account_summary", {}) or {}
+    spend = acct.get("Spend_Analysis", {}) or {}
+    return {
+        "User_ID": u["User_ID"],
+        "Account_Balance": float(acct.get("Total_Balance", 0.0) or 0.0),
+        "Previous_Transaction_Amount": float(spend.get("Outflow", 0.0) or 0.0),
+        "Avg_Transaction_Amount_Per_Day": float(spend.get("Inflow", 0.0) or 0.0),
+        "Avg_Transactions_amount_7Day": float(spend.get("Outflow", 0.0) or 0.0),
+        "Card_Age_Months": int(acct.get("Card_Age_Months", 0) or 0),
+    }
+
+class FeatureSliceCache:
+    def __init__(self, max_entries=FEATURE_CACHE_MAX):
+        self.max_entries = max_entries
+        self._entries = {}  # user_id -> (schema checksum, version, raw, partial row); insertion order = eviction order
+        self._missing = {}  # schema checksum -> [(index, column)] still encoded per transaction
+        self._lock = threading.Lock()  # writers only; lookups are a plain dict get
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, bundle, u):
+        """(raw static features, partial for pipeline.encode_row) for user document u."""
+        checksum = bundle["schema_checksum"]
+        version = u.get(FEATURES_VERSION_FIELD, 0)
+        entry = self._entries.get(u["User_ID"])
+        if entry is not None and entry[0] == checksum and entry[1] == version:
+            self.hits += 1
+            return entry[2], (entry[3], self._missing[checksum])
+        self.misses += 1
+        raw = static_features(u)
+        columns = bundle["feature_columns"]
+        missing = self._missing.get(checksum)
+        if missing is None:
+            missing = [(i, col) for i, col in enumerate(columns) if col not in raw]
+            self._missing[checksum] = missing
+        row = tuple(encode_value(bundle, col, raw[col]) if col in raw else None for col in columns)
+        with self._lock:
+            self._entries[u["User_ID"]] = (checksum, version, raw, row)
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+        return raw, (row, missing)
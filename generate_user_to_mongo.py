@@ -7,6 +7,7 @@ generate_user_to_mongo.py (robust bulk-upsert version)
 - Ensures all values are native Python types (no numpy / pandas types).
 - Retries bulk_write on transient errors and logs problematic user_ids.
 - Excludes per-transaction Is_Weekend / Is_Fraud as requested; keeps per-user Is_Fraud aggregate.
+- Builds each user's known_devices / known_ips counters from all of their transactions.
 
 Usage:
     python generate_user_to_mongo.py
@@ -22,6 +23,7 @@ import hashlib
 import pandas as pd
 from pymongo import MongoClient, UpdateOne, errors
 from tqdm import tqdm
+from membership import build_membership
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_PATH = os.path.join(BASE_DIR, "DATASET.csv")  # adjust if needed
@@ -142,6 +144,8 @@ def build_user_doc(user_id, g_sorted):
             "Card_Number": masked_card
         },
         "recent_transactions": recent_txns,
+        # known-device / known-IP counters over the full history (see membership.py)
+        **build_membership(g_sorted["Device_Type"].map(to_str), g_sorted["IP_Address"].map(to_str)),
         # user-level Is_Fraud aggregate: 1 if any transaction has Is_Fraud == 1
         "Is_Fraud": 1 if to_int(g_sorted["Is_Fraud"].astype(int).sum(), 0) > 0 else 0,
         "demo_plain_password": password_plain,
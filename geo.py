@@ -0,0 +1,132 @@
+"""
+geo.py
+
+Real Transaction_Distance_KM values for scoring:
+
+- CITY_COORDS: lat/lon for the cities in ALLOWED_LOCATIONS.
+- GeoIndex precomputes the great-circle (haversine) distance matrix over the
+  allowed locations once, so city-to-city distance is two dict lookups.
+- IP-to-city resolution uses a sorted list of IPv4 ranges loaded from a local
+  CSV (start_ip,end_ip,city) and searched with bisect: O(log n) per request.
+
+ip_locations.csv format (header required, IPs dotted or integer):
+    start_ip,end_ip,city
+    49.36.0.0,49.36.255.255,Mumbai
+"""
+import os
+import csv
+import math
+import bisect
+import ipaddress
+
+EARTH_RADIUS_KM = 6371.0088
+# floor for same-city transactions (the old hard-coded "location kept" value)
+LOCAL_DISTANCE_KM = 5.0
+# used when a city is not in CITY_COORDS (the old hard-coded "location changed" value)
+UNKNOWN_DISTANCE_KM = 426.78
+
+CITY_COORDS = {
+    "Pimpri-Chinchwad": (18.6298, 73.7997),
+    "Hyderabad": (17.3850, 78.4867),
+    "Ahmedabad": (23.0225, 72.5714),
+    "Bengaluru": (12.9716, 77.5946),
+    "Bhopal": (23.2599, 77.4126),
+    "Chennai": (13.0827, 80.2707),
+    "Delhi": (28.7041, 77.1025),
+    "Indore": (22.7196, 75.8577),
+    "Kanpur": (26.4499, 80.3319),
+    "Kolkata": (22.5726, 88.3639),
+    "Lucknow": (26.8467, 80.9462),
+    "Mumbai": (19.0760, 72.8777),
+    "Nagpur": (21.1458, 79.0882),
+    "Surat": (21.1702, 72.8311),
+    "Vadodara": (22.3072, 73.1812),
+    "Visakhapatnam": (17.6868, 83.2185),
+    "Patna": (25.5941, 85.1376),
+    "Jaipur": (26.9124, 75.7873),
+    "Thane": (19.2183, 72.9781),
+    "Pune": (18.5204, 73.8567),
+}
+
+def haversine_km(a, b):
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+def ip_to_int(ip):
+    """IPv4 string (or integer string) -> int, None if not an IPv4 address."""
+    s = str(ip).strip()
+    if s.isdigit():
+        return int(s)
+    try:
+        addr = ipaddress.ip_address(s)
+    except ValueError:
+        return None
+    return int(addr) if addr.version == 4 else None
+
+def _norm(city):
+    return str(city or "").strip().lower()
+
+class GeoIndex:
+    def __init__(self, locations, ip_ranges_path=None):
+        known = [c for c in locations if c in CITY_COORDS]
+        missing = [c for c in locations if c not in CITY_COORDS]
+        if missing:
+            print(f"[WARN] No coordinates for locations: {missing}")
+        self._index = {_norm(c): i for i, c in enumerate(known)}
+        coords = [CITY_COORDS[c] for c in known]
+        self._matrix = [[haversine_km(a, b) for b in coords] for a in coords]
+        self._starts, self._ends, self._cities = [], [], []
+        if ip_ranges_path:
+            self.load_ip_ranges(ip_ranges_path)
+
+    def load_ip_ranges(self, path):
+        if not os.path.exists(path):
+            print(f"[INFO] IP location file not found at {path}; IP-based distance disabled")
+            return
+        rows = []
+        with open(path, newline="") as f:
+            for rec in csv.DictReader(f):
+                start, end = ip_to_int(rec.get("start_ip")), ip_to_int(rec.get("end_ip"))
+                city = (rec.get("city") or "").strip()
+                if start is None or end is None or start > end or not city:
+                    continue
+                rows.append((start, end, city))
+        rows.sort()
+        self._starts = [r[0] for r in rows]
+        self._ends = [r[1] for r in rows]
+        self._cities = [r[2] for r in rows]
+        print(f"[INFO] Loaded {len(rows)} IP ranges from {path}")
+
+    def city_for_ip(self, ip):
+        n = ip_to_int(ip)
+        if n is None or not self._starts:
+            return None
+        i = bisect.bisect_right(self._starts, n) - 1
+        if i >= 0 and n <= self._ends[i]:
+            return self._cities[i]
+        return None
+
+    def city_distance_km(self, a, b):
+        """Great-circle distance between two known cities, None if either is unknown."""
+        i, j = self._index.get(_norm(a)), self._index.get(_norm(b))
+        if i is None or j is None:
+            return None
+        return self._matrix[i][j]
+
+    def transaction_distance_km(self, home, txn_location, ip=None):
+        """
+        Distance from the user's home city to where the transaction happens:
+        the farther of the transaction location and the IP's city (when resolvable).
+        """
+        d = self.city_distance_km(home, txn_location)
+        if d is None:
+            # old behaviour for cities we have no coordinates for
+            d = UNKNOWN_DISTANCE_KM if (txn_location and _norm(txn_location) != _norm(home)) else LOCAL_DISTANCE_KM
+        ip_city = self.city_for_ip(ip) if ip else None
+        if ip_city:
+            d_ip = self.city_distance_km(home, ip_city)
+            if d_ip is not None:
+                d = max(d, d_ip)
+        return round(max(d, LOCAL_DISTANCE_KM), 2)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+ip_reputation.py
+
+IP reputation lookups that drive IP_Address_Flagged in app.py.
+
+- Sources: ip_blocklist.txt / ip_allowlist.txt, one IPv4 address or CIDR per line
+  ('#' starts a comment). An allowlisted address is never flagged.
+- Build: both lists are merged into sorted, non-overlapping integer ranges and
+  written to ip_reputation.idx (uint32 arrays, see INDEX_MAGIC below).
+- Lookup: the index is memory-mapped and searched with bisect straight on the
+  mapped pages, so workers share it and a lookup is a few microseconds.
+- Reload: when a source file is newer than the index, the next check (at most
+  every RELOAD_CHECK_SECONDS) rebuilds the file on a background thread and swaps
+  the mapping; no restart. Lookups keep using the previous mapping meanwhile.
+
+Usage:
+    python ip_reputation.py build
+    python ip_reputation.py lookup 121.241.105.93
+"""
+import os
+import sys
+import time
+import mmap
+import array
+import bisect
+import struct
+import threading
+import ipaddress
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BLOCKLIST_PATH = os.path.join(BASE_DIR, "ip_blocklist.txt")
+ALLOWLIST_PATH = os.path.join(BASE_DIR, "ip_allowlist.txt")
+INDEX_PATH = os.path.join(BASE_DIR, "ip_reputation.idx")
+RELOAD_CHECK_SECONDS = 30
+
+# header: magic, version, n_block, n_allow; then block_starts, block_ends, allow_starts, allow_ends (uint32)
+INDEX_MAGIC = b"IPRP"
+INDEX_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+
+def parse_ranges(path):
+    """Read IPs / CIDRs from a list file into merged (start, end) integer ranges."""
+    ranges = []
+    if not os.path.exists(path):
+        return ranges
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            entry = line.split("#", 1)[0].strip()
+            if not entry:
+                continue
+            try:
+                net = ipaddress.ip_network(entry, strict=False)
+            except ValueError:
+                print(f"[WARN] {os.path.basename(path)}:{lineno}: not an IP/CIDR: {entry}")
+                continue
+            if net.version != 4:
+                continue
+            ranges.append((int(net.network_address), int(net.broadcast_address)))
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def build_index(blocklist=BLOCKLIST_PATH, allowlist=ALLOWLIST_PATH, out_path=INDEX_PATH):
+    block, allow = parse_ranges(blocklist), parse_ranges(allowlist)
+    payload = array.array("I")
+    for ranges in (block, allow):
+        payload.extend(r[0] for r in ranges)
+        payload.extend(r[1] for r in ranges)
+    if sys.byteorder != "little":
+        payload.byteswap()
+    # per-process temp file: serve.py workers may all notice the same change and rebuild at once
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(block), len(allow)))
+        f.write(payload.tobytes())
+    os.replace(tmp, out_path)  # atomic: readers see the old or the new file, never half of one
+    return len(block), len(allow)
+
+class _MappedIndex:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mm) < HEADER.size:
+            raise ValueError(f"{path} is truncated")
+        magic, version, n_block, n_allow = HEADER.unpack_from(self.mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{path} is not an IP reputation index (v{INDEX_VERSION})")
+        expected = HEADER.size + 2 * (n_block + n_allow) * 4
+        if len(self.mm) != expected:
+            raise ValueError(f"{path} is {len(self.mm)} bytes, header says {expected}")
+        words = memoryview(self.mm)[HEADER.size:].cast("I")
+        self.block_starts = words[0:n_block]
+        self.block_ends = words[n_block:2 * n_block]
+        off = 2 * n_block
+        self.allow_starts = words[off:off + n_allow]
+        self.allow_ends = words[off + n_allow:off + 2 * n_allow]
+        self.n_block, self.n_allow = n_block, n_allow
+
+    @staticmethod
+    def _contains(starts, ends, n):
+        i = bisect.bisect_right(starts, n) - 1
+        return i >= 0 and n <= ends[i]
+
+    def is_flagged(self, n):
+        return self._contains(self.block_starts, self.block_ends, n) and \
+            not self._contains(self.allow_starts, self.allow_ends, n)
+
+class ReputationIndex:
+    def __init__(self, blocklist=BLOCKLIST_PATH, allowlist=ALLOWLIST_PATH, index_path=INDEX_PATH):
+        self.blocklist, self.allowlist, self.index_path = blocklist, allowlist, index_path
+        self._current = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.refresh(force=True)
+
+    def _sources_newer(self):
+        try:
+            idx_mtime = os.path.getmtime(self.index_path)
+        except OSError:
+            return True
+        return any(os.path.exists(p) and os.path.getmtime(p) > idx_mtime for p in (self.blocklist, self.allowlist))
+
+    def refresh(self, force=False):
+        """Rebuild the index file if a source list changed, then (re)map it."""
+        with self._lock:
+            self._next_check = time.monotonic() + RELOAD_CHECK_SECONDS
+            stale = self._sources_newer()
+            if not (force or stale):
+                return
+            if not (os.path.exists(self.blocklist) or os.path.exists(self.index_path)):
+                self._current = None
+                return
+            try:
+                if stale:
+                    n_block, n_allow = build_index(self.blocklist, self.allowlist, self.index_path)
+                    print(f"[INFO] Rebuilt IP reputation index: {n_block} blocked, {n_allow} allowed ranges")
+                # swap in a fresh mapping; in-flight lookups keep using the old one
+                self._current = _MappedIndex(self.index_path)
+            except Exception as e:
+                print(f"[WARN] IP reputation reload failed, keeping previous index: {e}")
+
+    def _refresh_in_background(self):
+        # parsing the lists and writing the index must not run on a request thread
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._next_check = time.monotonic() + RELOAD_CHECK_SECONDS
+        threading.Thread(target=self._background_refresh, name="ip-reputation-reload", daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+
+    def is_flagged(self, ip):
+        if time.monotonic() >= self._next_check:
+            self._refresh_in_background()
+        idx = self._current
+        if idx is None:
+            return False
+        try:
+            addr = ipaddress.IPv4Address(str(ip).strip())
+        except ValueError:
+            return False
+        return idx.is_flagged(int(addr))
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("build", "lookup"):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == "build":
+        n_block, n_allow = build_index()
+        print(f"[OK] Wrote {INDEX_PATH}: {n_block} blocked, {n_allow} allowed ranges")
+        return
+    rep = ReputationIndex()
+    for ip in sys.argv[2:]:
+        t0 = time.perf_counter()
+        flagged = rep.is_flagged(ip)
+        print(f"{ip}: {'FLAGGED' if flagged else 'ok'} ({(time.perf_counter() - t0) * 1e6:.1f} us)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+loadgen.py
+
+Replays DATASET.csv rows as login -> initiate-transfer -> confirm-transfer flows
+against the API to find how many transfers per second one app.py instance sustains.
+
+- Open loop: flows start on a fixed schedule (--rate per second, optionally Poisson),
+  whether or not earlier flows have finished, so a slow server shows up as queueing
+  instead of silently lowering the offered load.
+- --users virtual users (worker threads) execute flows; a User_ID is never replayed
+  by two flows at once because sessions and pending transfers are per user.
+- Latency is measured from the scheduled start (includes queueing) and per endpoint.
+- --steps 5,10,20,50 sweeps several rates and prints one row per rate, which is
+  where the capacity knee shows up.
+- --local serves app.py from a child process on a mongomock stand-in seeded from
+  the same dataset (pip install mongomock), so no MongoDB is needed. The server
+  gets its own interpreter, so client threads do not share its GIL and skew
+  the latencies.
+
+Usage:
+    python loadgen.py --local --rate 20 --duration 30 --users 64
+    python loadgen.py --base-url http://127.0.0.1:5000/api --steps 10,20,40,80
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+import multiprocessing
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_PATH = os.path.join(BASE_DIR, "DATASET.csv")
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "fraud_detection_db"
+USERS_COL = "users"
+DEFAULT_PASSWORD = "Password123"  # generate_user_to_mongo.py demo password
+REQUEST_TIMEOUT = 10.0
+# confirm-transfer outcomes that are business results, not errors
+EXPECTED_CONFIRM_STATUS = {200: "completed", 403: "blocked", 402: "insufficient_funds"}
+
+# DATA
+def load_rows(path, max_rows):
+    rows = []
+    with open(path, newline="") as f:
+        for rec in csv.DictReader(f):
+            rows.append({k.strip(): v for k, v in rec.items()})
+            if max_rows and len(rows) >= max_rows:
+                break
+    return rows
+
+def fetch_credentials(mongo_uri, user_ids):
+    """demo_plain_password / demo_plain_secret for the replayed users, straight from MongoDB."""
+    from pymongo import MongoClient
+    col = MongoClient(mongo_uri)[DB_NAME][USERS_COL]
+    creds = {}
+    for doc in col.find({"User_ID": {"$in": list(user_ids)}},
+                        {"User_ID": 1, "demo_plain_password": 1, "demo_plain_secret": 1}):
+        creds[doc["User_ID"]] = (doc.get("demo_plain_password") or DEFAULT_PASSWORD, doc.get("demo_plain_secret") or "")
+    return creds
+
+def serve_local(dataset_path, max_rows, conn):
+    """
+    Child process: serve app.py on a mongomock database seeded like generate_user_to_mongo.py.
+    Sends ("ok", port, creds) or ("error", message) through conn, then serves until killed.
+    """
+    try:
+        import mongomock
+    except ImportError:
+        conn.send(("error", "--local needs mongomock: pip install mongomock"))
+        return
+    import pandas as pd
+    from werkzeug.serving import make_server
+    import generate_user_to_mongo as gen
+    import app as app_module
+
+    from mongo_conn import GuardedDatabase
+    mock_db = mongomock.MongoClient()[DB_NAME]
+    app_module.db = GuardedDatabase(mock_db, app_module.mongo_breaker)
+    app_module.users = app_module.db[USERS_COL]
+    # every virtual user connects from 127.0.0.1: the per-IP login/transfer limits
+    # would turn most of the offered load into 429s instead of measuring capacity
+    app_module.rate_limiter.limits = {}
+
+    df = pd.read_csv(dataset_path, low_memory=False, nrows=max_rows or None)
+    df.columns = df.columns.str.strip()
+    df["__t"] = pd.to_datetime(df["Transaction_Time"], dayfirst=True, errors="coerce")
+    creds = {}
+    docs = []
+    for user_id, g in df.groupby("User_ID"):
+        doc = gen.build_user_doc(user_id, g.sort_values("__t", ascending=False, na_position="last"))
+        docs.append(doc)
+        creds[doc["User_ID"]] = (doc["demo_plain_password"], doc["demo_plain_secret"])
+    if docs:
+        mock_db[USERS_COL].insert_many(docs)
+    print(f"[INFO] Seeded {len(docs)} users into the mongomock stand-in")
+
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    conn.send(("ok", server.server_port, creds))
+    conn.close()
+    server.serve_forever()
+
+def start_local_server(dataset_path, max_rows):
+    """Start serve_local in a child process; returns (base URL, credentials, process)."""
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    proc = multiprocessing.Process(target=serve_local, args=(dataset_path, max_rows, child_conn),
+                                   name="loadgen-server", daemon=True)
+    proc.start()
+    child_conn.close()
+    # seeding a large --max-rows takes a while; only give up if the child died
+    try:
+        while not parent_conn.poll(1.0):
+            if not proc.is_alive():
+                raise EOFError
+        msg = parent_conn.recv()
+    except EOFError:
+        proc.join(timeout=1.0)
+        print(f"[ERROR] local server exited during startup (exit code {proc.exitcode})")
+        sys.exit(1)
+    if msg[0] != "ok":
+        print(f"[ERROR] {msg[1]}")
+        sys.exit(1)
+    _, port, creds = msg
+    return f"http://127.0.0.1:{port}/api", creds, proc
+
+# HTTP
+def call(base_url, path, payload, token=None):
+    """POST JSON; returns (status, body_dict, elapsed_seconds). status 0 = transport error."""
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = token
+    req = urllib.request.Request(base_url + path, data=json.dumps(payload).encode(), headers=headers, method="POST")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=REQUEST_TIMEOUT) as resp:
+            status, raw = resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        status, raw = e.code, e.read()
+    except Exception:
+        return 0, {}, time.perf_counter() - t0
+    elapsed = time.perf_counter() - t0
+    try:
+        body = json.loads(raw or b"{}")
+    except ValueError:
+        body = {}
+    return status, body, elapsed
+
+# STATS
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(list)      # endpoint -> seconds
+        self.status = defaultdict(lambda: defaultdict(int))
+        self.flow_latency = []                # scheduled start -> flow end
+        self.start_lag = []                   # scheduled start -> worker picked it up
+        self.outcomes = defaultdict(int)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def record(self, endpoint, status, elapsed):
+        with self.lock:
+            self.latency[endpoint].append(elapsed)
+            self.status[endpoint][status] += 1
+
+# RUN
+class Replay:
+    def __init__(self, base_url, rows, creds, users):
+        self.base_url = base_url
+        self.rows = [r for r in rows if r.get("User_ID") in creds]
+        self.creds = creds
+        self.pool = ThreadPoolExecutor(max_workers=users, thread_name_prefix="vu")
+        self.busy = set()
+        self.busy_lock = threading.Lock()
+        self.cursor = 0
+
+    def next_row(self, stats):
+        """Next dataset row whose user has no flow in flight (None if all candidates are busy)."""
+        with self.busy_lock:
+            for _ in range(min(len(self.rows), 64)):
+                row = self.rows[self.cursor % len(self.rows)]
+                self.cursor += 1
+                if row["User_ID"] not in self.busy:
+                    self.busy.add(row["User_ID"])
+                    return row
+        with stats.lock:
+            stats.outcomes["skipped_user_busy"] += 1
+        return None
+
+    def flow(self, row, scheduled, stats):
+        started = time.perf_counter()
+        with stats.lock:
+            stats.start_lag.append(started - scheduled)
+            stats.in_flight += 1
+            stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        outcome = "error"
+        try:
+            user_id = row["User_ID"]
+            password, secret = self.creds[user_id]
+            status, body, el = call(self.base_url, "/login", {"user_id": user_id, "password": password})
+            stats.record("login", status, el)
+            if status != 200:
+                return
+            token = body["data"]["token"]
+            status, body, el = call(self.base_url, "/initiate-transfer", {
+                "beneficiary": "LOADGEN",
+                "amount": row.get("Transaction_Amount") or "1",
+                "txn_id": f"LG_{row.get('Transaction_ID', '')}_{random.randrange(1 << 30):x}",
+                "remarks": "loadgen replay",
+                "override_location": row.get("Location") or "-- keep current --",
+                "device_choice": row.get("Device_Type") or "-- keep current --",
+                "ip_choice": row.get("IP_Address") or "-- keep current --",
+            }, token)
+            stats.record("initiate-transfer", status, el)
+            if status != 200:
+                return
+            payload = {"otp": body.get("transfer_otp", "")}
+            if body.get("require_secret_key"):
+                payload["secret_key"] = secret
+            status, body, el = call(self.base_url, "/confirm-transfer", payload, token)
+            stats.record("confirm-transfer", status, el)
+            outcome = EXPECTED_CONFIRM_STATUS.get(status, "error")
+        finally:
+            with stats.lock:
+                stats.in_flight -= 1
+                stats.flow_latency.append(time.perf_counter() - scheduled)
+                stats.outcomes[outcome] += 1
+            with self.busy_lock:
+                self.busy.discard(row["User_ID"])
+
+    def run(self, rate, duration, poisson=False):
+        stats = Stats()
+        t_start = time.perf_counter()
+        next_at = t_start
+        futures = []
+        offered = 0
+        while next_at - t_start < duration:
+            now = time.perf_counter()
+            if now < next_at:
+                time.sleep(next_at - now)
+            offered += 1
+            row = self.next_row(stats)
+            if row is not None:
+                futures.append(self.pool.submit(self.flow, row, next_at, stats))
+            next_at += random.expovariate(rate) if poisson else 1.0 / rate
+        for f in futures:
+            f.result()
+        wall = time.perf_counter() - t_start
+        return summarise(stats, rate, offered, wall)
+
+def summarise(stats, rate, offered, wall):
+    finished = sum(stats.outcomes.values()) - stats.outcomes.get("skipped_user_busy", 0)
+    errors = stats.outcomes.get("error", 0)
+    achieved = finished / wall if wall else 0.0
+    lag_p99 = percentile(stats.start_lag, 99)
+    return {
+        "offered_rate": rate,
+        "offered": offered,
+        "finished": finished,
+        "achieved_rate": achieved,
+        "error_rate": errors / finished if finished else float("nan"),
+        "outcomes": dict(stats.outcomes),
+        "flow_p50_ms": percentile(stats.flow_latency, 50) * 1000,
+        "flow_p99_ms": percentile(stats.flow_latency, 99) * 1000,
+        "start_lag_p99_ms": lag_p99 * 1000,
+        "max_in_flight": stats.max_in_flight,
+        # falling behind the schedule is the saturation signal in an open-loop test
+        "saturated": achieved < 0.95 * rate or lag_p99 > 1.0,
+        "endpoints": {
+            ep: {
+                "count": len(lat),
+                "p50_ms": percentile(lat, 50) * 1000,
+                "p99_ms": percentile(lat, 99) * 1000,
+                "status": dict(stats.status[ep]),
+            } for ep, lat in stats.latency.items()
+        },
+    }
+
+def print_report(s):
+    print(f"\n================ {s['offered_rate']:.1f} flows/s offered ================")
+    print(f"Flows finished      : {s['finished']} of {s['offered']} scheduled  ({s['achieved_rate']:.1f}/s achieved)")
+    print(f"Outcomes            : {s['outcomes']}")
+    print(f"Error rate          : {s['error_rate']*100:.2f}%")
+    print(f"Flow latency p50/p99: {s['flow_p50_ms']:.1f} / {s['flow_p99_ms']:.1f} ms (from scheduled start)")
+    print(f"Start lag p99       : {s['start_lag_p99_ms']:.1f} ms   max in flight: {s['max_in_flight']}")
+    print(f"Saturated           : {'YES' if s['saturated'] else 'no'}")
+    for ep, e in s["endpoints"].items():
+        print(f"  {ep:<18} n={e['count']:<6} p50={e['p50_ms']:7.1f} ms  p99={e['p99_ms']:7.1f} ms  status={e['status']}")
+
+def main():
+    ap = argparse.ArgumentParser(description="Open-loop dataset replay load generator")
+    ap.add_argument("--base-url", default="http://127.0.0.1:5000/api")
+    ap.add_argument("--dataset", default=DATASET_PATH)
+    ap.add_argument("--max-rows", type=int, default=5000, help="rows to load from the dataset (0 = all)")
+    ap.add_argument("--rate", type=float, default=10.0, help="flows started per second")
+    ap.add_argument("--steps", default="", help="comma-separated rates to sweep, overrides --rate")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds per rate")
+    ap.add_argument("--users", type=int, default=32, help="concurrent virtual users")
+    ap.add_argument("--poisson", action="store_true", help="exponential inter-arrival times")
+    ap.add_argument("--local", action="store_true", help="serve app.py from a child process on a mongomock stand-in")
+    ap.add_argument("--mongo-uri", default=MONGO_URI, help="where to read demo credentials from (non --local)")
+    ap.add_argument("--json", default="", help="also write the results to this file")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.dataset):
+        print(f"[ERROR] dataset not found at {args.dataset}")
+        sys.exit(1)
+    rows = load_rows(args.dataset, args.max_rows)
+    if args.local:
+        base_url, creds, _server_proc = start_local_server(args.dataset, args.max_rows)
+    else:
+        base_url = args.base_url
+        creds = fetch_credentials(args.mongo_uri, {r["User_ID"] for r in rows})
+    replay = Replay(base_url, rows, creds, args.users)
+    if not replay.rows:
+        print("[ERROR] none of the dataset users exist in the target database")
+        sys.exit(1)
+
+    rates = [float(r) for r in args.steps.split(",") if r.strip()] or [args.rate]
+    results = []
+    for rate in rates:
+        s = replay.run(rate, args.duration, args.poisson)
+        print_report(s)
+        results.append(s)
+
+    if len(results) > 1:
+        print("\n  offered   achieved   p99 flow ms   errors   saturated")
+        for s in results:
+            print(f"  {s['offered_rate']:7.1f}   {s['achieved_rate']:8.1f}   {s['flow_p99_ms']:11.1f}   "
+                  f"{s['error_rate']*100:5.1f}%   {'YES' if s['saturated'] else 'no'}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+membership.py
+
+Per-user known-device / known-IP index stored on the user document:
+
+    "known_devices": {"Mobile": 7, "Tablet": 1},
+    "known_ips": {"117_108_194_20": 5}
+
+- Built in bulk from the full transaction history by generate_user_to_mongo.py.
+- Kept current by api_confirm_transfer with a single $inc per confirmed transfer.
+- Novelty checks are one dict lookup on the already-loaded user document; no scan
+  of recent_transactions.
+MongoDB field names cannot contain "." or start with "$", so values are stored
+under field_key(value).
+"""
+from collections import Counter
+
+KNOWN_DEVICES_FIELD = "known_devices"
+KNOWN_IPS_FIELD = "known_ips"
+# how many confirmed uses make a device/IP "known"
+KNOWN_MIN_COUNT = 1
+# values that never describe a real device / address
+_IGNORED = {"", "unknown", "-- keep current --", "nan", "none"}
+
+def field_key(value):
+    return str(value).strip().replace(".", "_").replace("$", "_")
+
+def _usable(value):
+    return value is not None and str(value).strip().lower() not in _IGNORED
+
+def build_membership(devices, ips):
+    """Counter-based index over a user's whole history (bulk import path)."""
+    return {
+        KNOWN_DEVICES_FIELD: dict(Counter(field_key(d) for d in devices if _usable(d))),
+        KNOWN_IPS_FIELD: dict(Counter(field_key(i) for i in ips if _usable(i))),
+    }
+
+def is_known(counts, value):
+    """True/False if the index exists, None if this user has no index yet."""
+    if counts is None:
+        return None
+    return _usable(value) and counts.get(field_key(value), 0) >= KNOWN_MIN_COUNT
+
+def increment_ops(device, ip):
+    """$inc document recording one confirmed use of device and ip."""
+    inc = {}
+    if _usable(device):
+        inc[f"{KNOWN_DEVICES_FIELD}.{field_key(device)}"] = 1
+    if _usable(ip):
+        inc[f"{KNOWN_IPS_FIELD}.{field_key(ip)}"] = 1
+    return inc
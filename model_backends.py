@@ -0,0 +1,33 @@
+"""
+model_backends.py
+
+Model backends the training pipeline can produce. Each factory returns an
+unfitted sklearn estimator exposing predict_proba, so serving code (app.py,
+pipeline.preprocess) works unchanged whichever backend a bundle contains.
+
+- random_forest: the original 200-tree RandomForestClassifier (explanations supported)
+- hist_gb: HistGradientBoostingClassifier - binned features, much smaller and faster per row
+- logistic: standardised LogisticRegression - the cheapest baseline
+
+All use the same 1:5 class weighting to penalise missed frauds.
+"""
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+CLASS_WEIGHT = {0: 1, 1: 5}
+
+BACKENDS = {
+    "random_forest": lambda: RandomForestClassifier(
+        n_estimators=200, random_state=42, class_weight=CLASS_WEIGHT, max_depth=10),
+    "hist_gb": lambda: HistGradientBoostingClassifier(
+        max_iter=200, learning_rate=0.1, max_leaf_nodes=31, class_weight=CLASS_WEIGHT, random_state=42),
+    "logistic": lambda: make_pipeline(
+        StandardScaler(), LogisticRegression(max_iter=1000, class_weight=CLASS_WEIGHT)),
+}
+
+def make_model(backend):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown model backend {backend!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[backend]()
@@ -0,0 +1,154 @@
+"""
+mongo_conn.py
+
+MongoDB connection layer for app.py:
+
+- make_client(): MongoClient with an explicit pool size and tight connect /
+  server-selection / socket / wait-queue timeouts (all configurable by env).
+- GuardedDatabase / GuardedCollection: drop-in wrappers whose operations run
+  under a per-operation deadline (pymongo.timeout) and through a CircuitBreaker.
+  Cursor-returning methods (find, aggregate) are read to a list inside the guard,
+  because the network reads happen on iteration: pass sort/limit as arguments,
+  and use an unguarded collection for large scans.
+- After BREAKER_FAILURE_THRESHOLD consecutive connectivity failures the breaker
+  opens and every operation fails immediately with DatabaseUnavailable for
+  BREAKER_RESET_SECONDS. One trial operation is then let through (half-open);
+  success closes the breaker again.
+
+Callers catch DatabaseUnavailable and fall back to in-memory state, so a slow
+database costs at most one deadline per request instead of a stalled thread.
+"""
+import os
+import time
+import threading
+import contextlib
+
+import pymongo
+from pymongo import MongoClient, errors
+
+MONGO_POOL_SIZE = int(os.environ.get("FRAUD_MONGO_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("FRAUD_MONGO_MIN_POOL_SIZE", "0"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("FRAUD_MONGO_SELECT_TIMEOUT_MS", "2000"))
+CONNECT_TIMEOUT_MS = int(os.environ.get("FRAUD_MONGO_CONNECT_TIMEOUT_MS", "1000"))
+SOCKET_TIMEOUT_MS = int(os.environ.get("FRAUD_MONGO_SOCKET_TIMEOUT_MS", "2000"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("FRAUD_MONGO_WAIT_QUEUE_TIMEOUT_MS", "500"))
+# deadline for one operation including retries and pool checkout
+OP_TIMEOUT_SECONDS = float(os.environ.get("FRAUD_MONGO_OP_TIMEOUT_S", "0.5"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("FRAUD_MONGO_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("FRAUD_MONGO_BREAKER_RESET_S", "10"))
+
+# errors that mean "the database is slow or unreachable", as opposed to a bad query
+CONNECTIVITY_ERRORS = (
+    errors.AutoReconnect,            # includes NetworkTimeout, ConnectionFailure subclasses
+    errors.ConnectionFailure,
+    errors.ServerSelectionTimeoutError,
+    errors.ExecutionTimeout,
+    errors.WaitQueueTimeoutError,
+)
+
+class DatabaseUnavailable(Exception):
+    """MongoDB timed out / is unreachable, or the circuit breaker is open."""
+
+def make_client(uri):
+    return MongoClient(
+        uri,
+        connect=False,  # connect on first use, not at import / before fork
+        maxPoolSize=MONGO_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=SOCKET_TIMEOUT_MS,
+        waitQueueTimeoutMS=WAIT_QUEUE_TIMEOUT_MS,
+    )
+
+def _deadline():
+    # pymongo.timeout (client-side operation timeout) exists in pymongo >= 4.2
+    timeout = getattr(pymongo, "timeout", None)
+    return timeout(OP_TIMEOUT_SECONDS) if timeout else contextlib.nullcontext()
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN  # let exactly one trial operation through
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                    print(f"[WARN] MongoDB circuit breaker opened after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+# methods whose result is a lazy cursor; GuardedCollection materialises it
+CURSOR_METHODS = frozenset({"find", "aggregate", "list_indexes"})
+
+class GuardedCollection:
+    """Collection proxy: every method call goes through the breaker and the op deadline."""
+
+    def __init__(self, collection, breaker):
+        self._collection = collection
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def guarded(*args, **kwargs):
+            if not self._breaker.allow():
+                raise DatabaseUnavailable(f"circuit open, skipped {self._collection.name}.{name}")
+            try:
+                with _deadline():
+                    result = attr(*args, **kwargs)
+                    if name in CURSOR_METHODS:
+                        result = list(result)
+            except CONNECTIVITY_ERRORS as e:
+                self._breaker.record_failure()
+                raise DatabaseUnavailable(f"{self._collection.name}.{name}: {e}") from e
+            except errors.PyMongoError as e:
+                if getattr(e, "timeout", False):
+                    self._breaker.record_failure()
+                    raise DatabaseUnavailable(f"{self._collection.name}.{name}: {e}") from e
+                self._breaker.record_success()  # the server answered; the query itself was bad
+                raise
+            self._breaker.record_success()
+            return result
+        return guarded
+
+class GuardedDatabase:
+    def __init__(self, database, breaker):
+        self._database = database
+        self._breaker = breaker
+
+    def __getitem__(self, name):
+        return GuardedCollection(self._database[name], self._breaker)
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
@@ -0,0 +1,176 @@
+"""
+pipeline.py
+
+One versioned artifact (fraud_pipeline.pkl) holding everything needed to turn a
+raw transaction dict into a fraud probability:
+
+    {
+      "version", "created_at", "backend",
+      "feature_columns",            # exact training column order
+      "label_encoders", "scalers",  # fitted sklearn objects (kept for reference)
+      "encoder_tables",             # {col: {class: code}} used at serving time
+      "scaler_params",              # {col: (scale, min)} used at serving time
+      "model",
+      "schema_checksum",            # sha256 over columns, classes and scaler params
+    }
+
+- Produced once by train_random_forest.py (fit_preprocessors + build_bundle), one
+  file per model backend (bundle_path).
+- Loaded by app.py and predict.py with a single pickle.load; nothing is refitted
+  at prediction time and rows are always reindexed to the training column order.
+"""
+import os
+import json
+import pickle
+import hashlib
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PIPELINE_PATH = os.path.join(BASE_DIR, "fraud_pipeline.pkl")
+PIPELINE_VERSION = 1
+DEFAULT_BACKEND = "random_forest"
+# fraud probability at which a transfer is blocked (app.py, stream_scorer.py) or flagged (shadow.py)
+BLOCK_THRESHOLD = 0.8
+
+CATEGORICAL_COLS = [
+    'Transaction_ID', 'User_ID', 'Device_Type', 'Location',
+    'Merchant_Category', 'IP_Address', 'Card_Type', 'Authentication_Method'
+]
+NUMERICAL_COLS = [
+    'Transaction_Amount', 'Account_Balance', 'Previous_Transaction_Amount',
+    'Daily_transaction_count', 'Avg_Transaction_Amount_Per_Day',
+    'Avg_Transactions_amount_7Day', 'Failed_Transaction_Count_7d',
+    'Card_Age_Months', 'Transaction_Distance_KM'
+]
+BINARY_COLS = ['IP_Address_Flagged', 'Is_Weekend']
+# DATASET.csv order without Is_Fraud / Transaction_Time; used when a model carries no feature names
+DEFAULT_FEATURE_COLUMNS = [
+    'Transaction_ID', 'User_ID', 'Transaction_Amount', 'Account_Balance', 'Device_Type',
+    'Location', 'Merchant_Category', 'IP_Address', 'IP_Address_Flagged',
+    'Previous_Transaction_Amount', 'Daily_transaction_count', 'Avg_Transaction_Amount_Per_Day',
+    'Avg_Transactions_amount_7Day', 'Failed_Transaction_Count_7d', 'Card_Type',
+    'Card_Age_Months', 'Transaction_Distance_KM', 'Authentication_Method', 'Is_Weekend'
+]
+TIME_FORMAT = "%d-%m-%Y %H:%M"
+
+def bundle_path(backend=DEFAULT_BACKEND):
+    """fraud_pipeline.pkl for the default backend, fraud_pipeline_<backend>.pkl otherwise."""
+    if backend == DEFAULT_BACKEND:
+        return PIPELINE_PATH
+    return os.path.join(BASE_DIR, f"fraud_pipeline_{backend}.pkl")
+
+def fit_preprocessors(df_raw):
+    """Fit one LabelEncoder per categorical and one MinMaxScaler per numerical column."""
+    from sklearn.preprocessing import LabelEncoder, MinMaxScaler
+    label_encoders = {}
+    for col in CATEGORICAL_COLS:
+        le = LabelEncoder()
+        le.fit(df_raw[col].astype(str))
+        label_encoders[col] = le
+    scalers = {}
+    for col in NUMERICAL_COLS:
+        scaler = MinMaxScaler()
+        scaler.fit(df_raw[[col]])
+        scalers[col] = scaler
+    return label_encoders, scalers
+
+def schema_checksum(bundle):
+    schema = {
+        "version": bundle["version"],
+        "feature_columns": bundle["feature_columns"],
+        "encoder_tables": {c: sorted(t.items(), key=lambda kv: kv[1]) for c, t in bundle["encoder_tables"].items()},
+        "scaler_params": {c: list(p) for c, p in bundle["scaler_params"].items()},
+    }
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+def build_bundle(model, label_encoders, scalers, feature_columns=None, backend=DEFAULT_BACKEND):
+    if feature_columns is None:
+        names = getattr(model, "feature_names_in_", None)
+        feature_columns = list(names) if names is not None else list(DEFAULT_FEATURE_COLUMNS)
+    bundle = {
+        "version": PIPELINE_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "backend": backend,
+        "feature_columns": [str(c) for c in feature_columns],
+        "label_encoders": label_encoders,
+        "scalers": scalers,
+        "encoder_tables": {
+            col: {str(c): i for i, c in enumerate(getattr(enc, "classes_", []))}
+            for col, enc in label_encoders.items()
+        },
+        "scaler_params": {
+            col: (float(sc.scale_[0]), float(sc.min_[0]))
+            for col, sc in scalers.items() if hasattr(sc, "scale_")
+        },
+        "model": model,
+    }
+    bundle["schema_checksum"] = schema_checksum(bundle)
+    return bundle
+
+def save_bundle(bundle, path=PIPELINE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def load_bundle(path=PIPELINE_PATH):
+    """Load and verify a pipeline bundle; None if the file does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        bundle = pickle.load(f)
+    version = bundle.get("version") if isinstance(bundle, dict) else None
+    if version != PIPELINE_VERSION:
+        raise ValueError(f"{path}: unsupported pipeline version {version}")
+    if schema_checksum(bundle) != bundle.get("schema_checksum"):
+        raise ValueError(f"{path}: schema checksum mismatch (encoders/scalers/columns out of sync)")
+    return bundle
+
+def _is_weekend(txn_time):
+    try:
+        return 1 if datetime.strptime(str(txn_time).strip(), TIME_FORMAT).weekday() >= 5 else 0
+    except ValueError:
+        return 0
+
+def encode_value(bundle, col, v):
+    """Encode one raw value exactly as training did."""
+    table = bundle["encoder_tables"].get(col)
+    if table is not None:
+        return table.get(str(v), -1)  # unknown category -> -1
+    params = bundle["scaler_params"].get(col)
+    if params is not None:
+        scale, offset = params
+        try:
+            return float(v) * scale + offset
+        except (TypeError, ValueError):
+            return 0.0
+    if col in BINARY_COLS:
+        return min(max(int(float(v or 0)), 0), 1)
+    return v
+
+def encode_column(bundle, col, txn_dict):
+    if col == "Is_Weekend" and col not in txn_dict:
+        return _is_weekend(txn_dict.get("Transaction_Time"))
+    return encode_value(bundle, col, txn_dict.get(col, 0))
+
+def encode_row(bundle, txn_dict, partial=None):
+    """
+    Raw transaction dict -> list of model inputs in training column order.
+    partial: (row, missing) from feature_cache.py - a row with the static columns
+        already encoded, and the (index, column) pairs still to encode from txn_dict.
+    """
+    if partial is None:
+        return [encode_column(bundle, col, txn_dict) for col in bundle["feature_columns"]]
+    row, missing = partial
+    row = list(row)
+    for i, col in missing:
+        row[i] = encode_column(bundle, col, txn_dict)
+    return row
+
+def preprocess(bundle, txn_dict, partial=None):
+    """One-row DataFrame ready for bundle["model"].predict_proba."""
+    import pandas as pd
+    return pd.DataFrame([encode_row(bundle, txn_dict, partial)], columns=bundle["feature_columns"])
+
+def predict_proba(bundle, txn_dict):
+    return float(bundle["model"].predict_proba(preprocess(bundle, txn_dict))[0][1])
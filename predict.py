@@ -1,88 +1,17 @@
-import pandas as pd
-from sklearn.preprocessing import LabelEncoder, MinMaxScaler
-import pickle
-import numpy as np
+from pipeline import load_bundle, preprocess
 
-# Load the raw dataset to fit the preprocessors
-df_raw = pd.read_csv('DATASET.csv')
-
-# Categorical columns to encode
-categorical_cols = [
-    'Transaction_ID', 'User_ID', 'Device_Type', 'Location', 
-    'Merchant_Category', 'IP_Address', 'Card_Type', 'Authentication_Method'
-]
-
-# Fit LabelEncoders
-label_encoders = {}
-for col in categorical_cols:
-    le = LabelEncoder()
-    df_raw[col] = le.fit_transform(df_raw[col].astype(str))
-    label_encoders[col] = le
-
-# Numerical columns to scale
-numerical_cols = [
-    'Transaction_Amount', 'Account_Balance', 'Previous_Transaction_Amount', 
-    'Daily_transaction_count', 'Avg_Transaction_Amount_Per_Day', 
-    'Avg_Transactions_amount_7Day', 'Failed_Transaction_Count_7d', 
-    'Card_Age_Months', 'Transaction_Distance_KM'
-]
-
-# Fit MinMaxScalers
-scalers = {}
-for col in numerical_cols:
-    scaler = MinMaxScaler()
-    df_raw[[col]] = scaler.fit_transform(df_raw[[col]])
-    scalers[col] = scaler
-
-# === SAVE ENCODERS AND SCALERS ===
-with open('label_encoders.pkl', 'wb') as f:
-    pickle.dump(label_encoders, f)
-
-with open('scalers.pkl', 'wb') as f:
-    pickle.dump(scalers, f)
-
-print("Saved label_encoders.pkl and scalers.pkl")
-
-# Binary columns (no processing needed, but ensure they are 0/1)
-binary_cols = ['IP_Address_Flagged', 'Is_Weekend']
-
-# Load the trained model
-with open('random_forest_model.pkl', 'rb') as f:
-    model = pickle.load(f)
-
-# Load one of the feature files to get the exact column order for prediction
-X_train = pd.read_csv('train_features.csv')
-feature_columns = X_train.columns.tolist()
+# Load the pipeline bundle written by train_random_forest.py (encoders, scalers,
+# training column order and model in one file; nothing is refitted here)
+bundle = load_bundle('fraud_pipeline.pkl')
+if bundle is None:
+    raise SystemExit("fraud_pipeline.pkl not found - run train_random_forest.py first")
+model = bundle['model']
 
 # Function to preprocess new input
 def preprocess_new_data(new_data_dict):
-    df_new = pd.DataFrame([new_data_dict])
-    
-    # Encode categorical columns, handle unknown with -1
-    for col in categorical_cols:
-        try:
-            df_new[col] = label_encoders[col].transform(df_new[col].astype(str))
-        except ValueError:
-            df_new[col] = -1  # Unknown category
-    
-    # Scale numerical columns
-    for col in numerical_cols:
-        if col in df_new.columns:
-            df_new[[col]] = scalers[col].transform(df_new[[col]])
-    
-    # Ensure binary columns are 0 or 1
-    for col in binary_cols:
-        if col in df_new.columns:
-            df_new[col] = df_new[col].clip(0, 1)
-    
-    # Drop Transaction_Time if present
-    if 'Transaction_Time' in df_new.columns:
-        df_new = df_new.drop(['Transaction_Time'], axis=1)
-    
-    # Reorder columns to match training features
-    df_new = df_new.reindex(columns=feature_columns, fill_value=0)
-    
-    return df_new
+    # Unknown categories -> -1, numerical columns min-max scaled, binary columns clipped,
+    # Transaction_Time dropped, columns reordered to match training features
+    return preprocess(bundle, new_data_dict)
 
 # === Manual Input Prediction ===
 print("\nEnter the transaction details manually (raw values):")
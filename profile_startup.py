@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+profile_startup.py
+
+- Imports app.py in a fresh interpreter under `python -X importtime`, once with
+  eager loading and once with FRAUD_FAST_STARTUP=1.
+- Reports wall time until `import app` returns (= when Flask could start serving),
+  time until /api/ready would report ready, and the slowest imports.
+
+Usage:
+    python profile_startup.py            # both modes
+    python profile_startup.py --top 25   # show more imports
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs inside the child interpreter; prints one JSON line on stdout
+CHILD_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import app
+t_import = time.perf_counter() - t0
+while not app.MODEL_STATE["ready"]:
+    time.sleep(0.01)
+t_ready = time.perf_counter() - t0
+print(json.dumps({"import_s": t_import, "ready_s": t_ready, "model_loaded": app.MODEL_STATE["model_loaded"]}))
+"""
+
+def parse_importtime(stderr_text):
+    """
+    Parse `-X importtime` lines ("import time: self [us] | cumulative | imported package")
+    into a list of (cumulative_us, self_us, module).
+    """
+    rows = []
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            parts = line[len("import time:"):].split("|")
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+            module = parts[2].rstrip()
+        except (IndexError, ValueError):
+            continue
+        rows.append((cumulative_us, self_us, module))
+    return rows
+
+def run_mode(fast):
+    env = dict(os.environ)
+    env["FRAUD_FAST_STARTUP"] = "1" if fast else "0"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", CHILD_SNIPPET],
+                          cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"[ERROR] import app failed ({'fast' if fast else 'eager'} mode):")
+        print(proc.stderr[-2000:])
+        return None
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+def main():
+    ap = argparse.ArgumentParser(description="Profile app.py import and warm-up time")
+    ap.add_argument("--top", type=int, default=15, help="number of slowest top-level imports to list")
+    args = ap.parse_args()
+
+    results = {}
+    for label, fast in (("eager", False), ("fast", True)):
+        res = run_mode(fast)
+        if res is None:
+            continue
+        results[label] = res
+        # only top-level imports (no leading indentation) to avoid double counting
+        top_level = [r for r in res["imports"] if not r[2].startswith(" ")]
+        top_level.sort(reverse=True)
+        print(f"\n================ {label} startup ================")
+        print(f"import app returned after : {res['import_s']*1000:8.1f} ms")
+        print(f"ready (model scoring) at  : {res['ready_s']*1000:8.1f} ms   model_loaded={res['model_loaded']}")
+        print(f"slowest top-level imports (cumulative):")
+        for cumulative_us, _self_us, module in top_level[:args.top]:
+            print(f"  {cumulative_us/1000:8.1f} ms  {module.strip()}")
+
+    if "eager" in results and "fast" in results:
+        gain = results["eager"]["import_s"] - results["fast"]["import_s"]
+        print(f"\n[OK] fast mode serves {gain*1000:.1f} ms earlier "
+              f"({results['eager']['import_s']*1000:.1f} -> {results['fast']['import_s']*1000:.1f} ms)")
+
+if __name__ == "__main__":
+    main()
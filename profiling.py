@@ -0,0 +1,127 @@
+"""
+profiling.py
+
+Production diagnostics for the API that need no attached profiler.
+
+- StageTimer: per-request stage breakdown. app.py starts one per request and the
+  transfer routes wrap their phases (session, features, model, writes...) in
+  stages. Requests slower than SLOW_REQUEST_MS are kept with their breakdown in
+  SlowRequestLog, a bounded ring buffer (oldest records drop off).
+- StackSampler: on-demand statistical profiler. For a set duration it reads
+  sys._current_frames() at a fixed interval, keeps only the threads currently
+  handling a request, and counts their stacks. The output is collapsed-stack
+  text ("root;frame;...;leaf count" per line), which flamegraph.pl and
+  speedscope read directly. The root frame is the request's method and path.
+
+Both are per process: with serve.py each worker has its own buffer and sampler.
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+SLOW_REQUEST_MS = float(os.environ.get("FRAUD_SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_BUFFER = int(os.environ.get("FRAUD_SLOW_REQUEST_BUFFER", "200"))
+MAX_PROFILE_SECONDS = 60.0
+MIN_SAMPLE_INTERVAL_S = 0.001
+
+class StageTimer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.stages = []  # (name, ms) in the order the stages finished
+
+    @contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append((name, (time.perf_counter() - t) * 1000))
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+class SlowRequestLog:
+    def __init__(self, threshold_ms=SLOW_REQUEST_MS, maxlen=SLOW_REQUEST_BUFFER):
+        self.threshold_ms = threshold_ms
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.captured = 0
+
+    def record(self, method, path, status, timer):
+        """Keep the stage breakdown of a finished request if it exceeded the threshold."""
+        total_ms = timer.elapsed_ms()
+        if total_ms < self.threshold_ms:
+            return
+        staged_ms = sum(ms for _, ms in timer.stages)
+        rec = {
+            "time": datetime.utcnow().isoformat(),
+            "method": method,
+            "path": path,
+            "status": status,
+            "total_ms": round(total_ms, 3),
+            "stages": [{"stage": name, "ms": round(ms, 3)} for name, ms in timer.stages],
+            # framework, hooks and anything outside a named stage
+            "unstaged_ms": round(max(0.0, total_ms - staged_ms), 3),
+            "thread": threading.current_thread().name,
+        }
+        with self._lock:
+            self._records.append(rec)
+            self.captured += 1
+
+    def recent(self, limit=None):
+        """Newest first."""
+        with self._lock:
+            records = list(self._records)
+        records.reverse()
+        return records[:limit] if limit else records
+
+class StackSampler:
+    def __init__(self):
+        self._active = {}  # thread ident -> "METHOD /path" while handling a request
+        self._busy = threading.Lock()
+
+    def enter(self, label):
+        self._active[threading.get_ident()] = label
+
+    def leave(self):
+        self._active.pop(threading.get_ident(), None)
+
+    def sample(self, seconds, interval_s):
+        """
+        Sample request-thread stacks for `seconds`.
+        returns: (collapsed-stack text, number of samples taken), or None if a
+        profile is already running in this process
+        """
+        if not self._busy.acquire(blocking=False):
+            return None
+        try:
+            seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+            interval_s = max(interval_s, MIN_SAMPLE_INTERVAL_S)
+            me = threading.get_ident()
+            counts = Counter()
+            samples = 0
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frames = sys._current_frames()
+                for ident, label in list(self._active.items()):
+                    frame = frames.get(ident)
+                    if ident == me or frame is None:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    stack.append(label)
+                    counts[";".join(reversed(stack))] += 1
+                del frames
+                samples += 1
+                time.sleep(interval_s)
+            text = "".join(f"{stack} {n}\n" for stack, n in counts.most_common())
+            return text, samples
+        finally:
+            self._busy.release()
@@ -0,0 +1,109 @@
+"""
+rate_limit.py
+
+In-process token-bucket rate limiting for the auth / OTP / transfer endpoints.
+
+- One bucket per (route, scope, key), where scope is "ip" or "user".
+  A bucket holds up to `capacity` tokens and refills at `per_minute / 60` tokens per second.
+- Buckets live in SHARDS independent dicts, each with its own lock. Concurrent
+  requests for different keys rarely contend, and a check is a hash, a lock and
+  a few float operations - no MongoDB access.
+- Idle buckets are evicted once a shard exceeds MAX_KEYS_PER_SHARD, so a flood of
+  distinct IPs cannot grow memory without bound.
+- Limits are per process: with serve.py each worker enforces them separately.
+
+Limits are configured in DEFAULT_LIMITS and can be overridden with a JSON env var:
+    FRAUD_RATE_LIMITS='{"login": {"user": [5, 5], "ip": [30, 60]}}'   # [capacity, per_minute]
+"""
+import os
+import json
+import time
+import threading
+
+SHARDS = 64
+MAX_KEYS_PER_SHARD = 10000
+
+# route -> scope -> (capacity, refills per minute)
+DEFAULT_LIMITS = {
+    "login": {"ip": (30, 30), "user": (10, 5)},
+    "request-otp": {"ip": (10, 5), "user": (3, 1)},
+    "verify-otp": {"ip": (20, 10), "user": (5, 2)},
+    "initiate-transfer": {"ip": (60, 60), "user": (10, 10)},
+}
+
+def load_limits():
+    limits = {route: dict(scopes) for route, scopes in DEFAULT_LIMITS.items()}
+    raw = os.environ.get("FRAUD_RATE_LIMITS", "")
+    if raw:
+        try:
+            for route, scopes in json.loads(raw).items():
+                limits.setdefault(route, {}).update({s: tuple(v) for s, v in scopes.items()})
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"[WARN] Ignoring invalid FRAUD_RATE_LIMITS: {e}")
+    return limits
+
+class TokenBucketLimiter:
+    def __init__(self, limits=None, shards=SHARDS, max_keys_per_shard=MAX_KEYS_PER_SHARD):
+        self.limits = limits if limits is not None else load_limits()
+        self.max_keys = max_keys_per_shard
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+        self.rejected = 0
+
+    def _take(self, bucket_key, capacity, rate):
+        """Take one token; returns seconds until a token is available (0.0 = allowed)."""
+        lock, buckets = self._shards[hash(bucket_key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, last = buckets.get(bucket_key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            if tokens >= 1.0:
+                buckets[bucket_key] = (tokens - 1.0, now)
+                wait = 0.0
+            else:
+                buckets[bucket_key] = (tokens, now)
+                wait = (1.0 - tokens) / rate if rate > 0 else 60.0
+            if len(buckets) > self.max_keys:
+                self._evict(buckets, now, rate, capacity)
+        return wait
+
+    def _refund(self, bucket_key, capacity):
+        """Give back a token taken by _take for a request another scope then rejected."""
+        lock, buckets = self._shards[hash(bucket_key) % len(self._shards)]
+        with lock:
+            entry = buckets.get(bucket_key)
+            if entry is not None:
+                buckets[bucket_key] = (min(capacity, entry[0] + 1.0), entry[1])
+
+    def _evict(self, buckets, now, rate, capacity):
+        # buckets that would be full again carry no state worth keeping
+        for k in [k for k, (t, last) in buckets.items() if t + (now - last) * rate >= capacity]:
+            del buckets[k]
+        # still nearly full: drop the oldest-inserted half
+        if len(buckets) > self.max_keys * 0.9:
+            for k in list(buckets)[: len(buckets) // 2]:
+                del buckets[k]
+
+    def check(self, route, ip=None, user=None):
+        """
+        Seconds to wait before retrying, or 0.0 when every applicable bucket allows the request.
+        The ip bucket is checked first and a rejection there returns at once. A token is
+        only spent when the request is allowed: if the user bucket rejects, the ip token
+        is given back, so a rejected request does not drain the caller's other bucket.
+        """
+        scopes = self.limits.get(route)
+        if not scopes:
+            return 0.0
+        taken = []
+        for scope, key in (("ip", ip), ("user", user)):
+            if not key or scope not in scopes:
+                continue
+            capacity, per_minute = scopes[scope]
+            bucket_key = (route, scope, key)
+            wait = self._take(bucket_key, float(capacity), float(per_minute) / 60.0)
+            if wait:
+                for k, cap in taken:
+                    self._refund(k, cap)
+                self.rejected += 1
+                return wait
+            taken.append((bucket_key, float(capacity)))
+        return 0.0
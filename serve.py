@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+serve.py
+
+Production entry point: pre-forked workers sharing one copy of the model.
+
+- The master imports app.py with eager loading, so the RandomForest, encoders
+  and scalers are unpickled once, before fork.
+- gc.freeze() then moves every object that exists at that point into the
+  permanent generation. The workers' garbage collector never walks them, so it
+  does not dirty (and copy) the pages holding the model.
+- The master opens the listening socket and forks --workers processes. Each
+  worker calls app.init_worker() for its own MongoDB pool (FRAUD_MONGO_POOL_SIZE
+  connections) and serves requests from the shared socket with a threaded WSGI server.
+- Workers that die are restarted; SIGTERM/SIGINT stop the whole group.
+
+Limits: each worker serves with werkzeug's threaded development server (Flask is
+the only web dependency in requirements.txt). It has no slow-client protection or
+request buffering, spawns one thread per connection without a cap, and a worker
+drops its in-flight requests on SIGTERM. Run it behind a reverse proxy that
+buffers requests and limits connections, and drain traffic before stopping it.
+
+Usage:
+    python serve.py --workers 4 --port 5000
+    python serve.py --workers 4 --report-memory   # print RSS/PSS per worker after start-up
+
+POSIX only (needs os.fork).
+"""
+import os
+import sys
+import gc
+import time
+import signal
+import socket
+import argparse
+
+def read_memory(pid):
+    """Rss / Pss / shared kB from /proc/<pid>/smaps_rollup (Linux), {} elsewhere."""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].rstrip(":") in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Dirty"):
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except OSError:
+        pass
+    return fields
+
+def print_memory(master_pid, workers):
+    print("[INFO]   pid      role      RSS MB   PSS MB   shared MB   private dirty MB")
+    for pid, role in [(master_pid, "master")] + [(p, "worker") for p in workers]:
+        m = read_memory(pid)
+        if not m:
+            continue
+        shared = m.get("Shared_Clean", 0) + m.get("Shared_Dirty", 0)
+        print(f"[INFO] {pid:>6}  {role:<7}  {m.get('Rss', 0)/1024:7.1f}  {m.get('Pss', 0)/1024:7.1f}  "
+              f"{shared/1024:10.1f}  {m.get('Private_Dirty', 0)/1024:17.1f}")
+
+def run_worker(app_module, sock, host, port):
+    from werkzeug.serving import make_server
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    app_module.init_worker()
+    server = make_server(host, port, app_module.app, threaded=True, fd=sock.fileno())
+    server.serve_forever()
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-fork production server for app.py")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=5000)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--report-memory", action="store_true", help="print per-process memory once workers are up")
+    args = ap.parse_args()
+
+    if not hasattr(os, "fork"):
+        print("[ERROR] serve.py needs os.fork (Linux/macOS); use `python app.py` on this platform")
+        sys.exit(1)
+
+    # the model must be in memory before fork, not loading in a warm-up thread
+    os.environ["FRAUD_FAST_STARTUP"] = "0"
+    import app as app_module
+    print(f"[INFO] Model loaded in master: {app_module.MODEL_STATE}")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    # everything allocated so far (model, encoders, indexes) stays out of the workers' GC
+    gc.collect()
+    gc.freeze()
+
+    workers = {}
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(app_module, sock, args.host, args.port)
+            finally:
+                os._exit(0)
+        workers[pid] = time.monotonic()
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        spawn()
+    print(f"[INFO] Serving on {args.host}:{args.port} with {args.workers} workers: {sorted(workers)}")
+    if args.report_memory:
+        time.sleep(2)
+        print_memory(os.getpid(), sorted(workers))
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if stopping or started is None:
+            continue
+        print(f"[WARN] worker {pid} exited with status {status}; restarting")
+        if time.monotonic() - started < 1.0:
+            time.sleep(1.0)  # avoid a tight crash loop
+        spawn()
+    print("[OK] All workers stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+shadow.py
+
+- Scores the same feature vectors as the live fraud_model with a candidate model
+  (e.g. a retrained random_forest_model.pkl) on a background thread pool, so the
+  request path only pays for a queue append.
+- Buffers (live, shadow) score pairs and writes them with insert_many into the
+  `shadow_scores` collection, either every FLUSH_BATCH docs or every FLUSH_INTERVAL_SECONDS.
+- `python shadow.py report` summarises agreement, threshold flips and latency.
+
+Enable in app.py with:
+    FRAUD_SHADOW_MODEL=/path/to/candidate_model.pkl python app.py
+"""
+import os
+import sys
+import time
+import pickle
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import BLOCK_THRESHOLD
+
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "fraud_detection_db"
+SHADOW_COLLECTION = "shadow_scores"
+
+FLAG_THRESHOLD = BLOCK_THRESHOLD  # same cut-off as api_confirm_transfer
+SHADOW_WORKERS = int(os.environ.get("FRAUD_SHADOW_WORKERS", "2"))
+FLUSH_BATCH = 100
+FLUSH_INTERVAL_SECONDS = 2.0
+MAX_PENDING = 1000             # shadow jobs beyond this are dropped, never queued unbounded
+
+class ShadowScorer:
+    def __init__(self, model, collection, model_path="", workers=SHADOW_WORKERS, bundle=None):
+        self.model = model
+        self.bundle = bundle  # candidate pipeline bundle: preprocess raw features with its own encoders
+        self.model_path = model_path
+        self.collection = collection
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        self.dropped = 0
+        self._pending = 0
+        self._buf = []
+        self._lock = threading.Lock()
+        # numpy array when the model was fitted on a DataFrame: never truth-test it
+        names = getattr(model, "feature_names_in_", None)
+        self._feature_order = list(names) if names is not None else []
+        threading.Thread(target=self._flush_loop, name="shadow-flush", daemon=True).start()
+
+    def after_fork(self, collection):
+        """Fresh pool, buffer and flusher thread in a forked worker; the model is shared."""
+        self.collection = collection
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._buf = []
+        threading.Thread(target=self._flush_loop, name="shadow-flush", daemon=True).start()
+
+    def submit(self, df_row, live_prob, live_ms, meta, features=None):
+        """
+        Queue one already-preprocessed row (and the raw features, used when the
+        candidate is a pipeline bundle) for shadow scoring. Never blocks or raises.
+        """
+        with self._lock:
+            if self._pending >= MAX_PENDING:
+                self.dropped += 1
+                return
+            self._pending += 1
+        try:
+            self.pool.submit(self._score, df_row, float(live_prob), float(live_ms), dict(meta), features)
+        except RuntimeError:
+            # pool shut down (interpreter exit)
+            with self._lock:
+                self._pending -= 1
+
+    def _score(self, df_row, live_prob, live_ms, meta, features=None):
+        doc = dict(meta)
+        doc.update({
+            "live_prob": live_prob,
+            "live_ms": live_ms,
+            "shadow_model": self.model_path,
+            "time": datetime.utcnow(),
+        })
+        try:
+            if self.bundle is not None and features is not None:
+                from pipeline import preprocess
+                df_row = preprocess(self.bundle, features)
+            elif self._feature_order:
+                df_row = df_row.reindex(columns=self._feature_order, fill_value=0)
+            t0 = time.perf_counter()
+            doc["shadow_prob"] = float(self.model.predict_proba(df_row)[0][1])
+            doc["shadow_ms"] = (time.perf_counter() - t0) * 1000
+        except Exception as e:
+            doc["shadow_error"] = str(e)
+        with self._lock:
+            self._pending -= 1
+            self._buf.append(doc)
+            full = len(self._buf) >= FLUSH_BATCH
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buf = self._buf, []
+        if not batch:
+            return
+        try:
+            self.collection.insert_many(batch, ordered=False)
+        except Exception as e:
+            print(f"[WARN] shadow bulk insert of {len(batch)} docs failed: {e}")
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL_SECONDS)
+            self.flush()
+
+def load_shadow_scorer(model_path, collection):
+    """
+    Return a ShadowScorer for the candidate (a pickled model or a fraud_pipeline.pkl
+    bundle), or None if it cannot be loaded.
+    """
+    if not model_path:
+        return None
+    try:
+        with open(model_path, "rb") as f:
+            model = pickle.load(f)
+    except Exception as e:
+        print(f"[WARN] Failed to load shadow model {model_path}: {e}")
+        return None
+    bundle = None
+    if isinstance(model, dict) and "model" in model:
+        bundle, model = model, model["model"]
+    try:
+        scorer = ShadowScorer(model, collection, model_path=model_path, bundle=bundle)
+    except Exception as e:
+        print(f"[WARN] Failed to set up shadow scoring for {model_path}: {e}")
+        return None
+    print(f"[INFO] Shadow scoring enabled with {model_path}")
+    return scorer
+
+# REPORT
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+def summarise(docs, threshold=FLAG_THRESHOLD):
+    """Aggregate shadow_scores docs into agreement / flip / latency numbers."""
+    scored = [d for d in docs if "shadow_prob" in d]
+    errors = sum(1 for d in docs if "shadow_error" in d)
+    live_flag_only = shadow_flag_only = both = 0
+    abs_diff = 0.0
+    for d in scored:
+        live_flag = d["live_prob"] >= threshold
+        shadow_flag = d["shadow_prob"] >= threshold
+        if live_flag and shadow_flag:
+            both += 1
+        elif live_flag:
+            live_flag_only += 1
+        elif shadow_flag:
+            shadow_flag_only += 1
+        abs_diff += abs(d["live_prob"] - d["shadow_prob"])
+    n = len(scored)
+    live_ms = [d["live_ms"] for d in scored]
+    shadow_ms = [d["shadow_ms"] for d in scored]
+    return {
+        "total": len(docs),
+        "scored": n,
+        "shadow_errors": errors,
+        "threshold": threshold,
+        "agreement": (n - live_flag_only - shadow_flag_only) / n if n else float("nan"),
+        "flagged_by_both": both,
+        "flips_live_only": live_flag_only,
+        "flips_shadow_only": shadow_flag_only,
+        "mean_abs_diff": abs_diff / n if n else float("nan"),
+        "live_p50_ms": percentile(live_ms, 50),
+        "live_p99_ms": percentile(live_ms, 99),
+        "shadow_p50_ms": percentile(shadow_ms, 50),
+        "shadow_p99_ms": percentile(shadow_ms, 99),
+    }
+
+def report(args):
+    from pymongo import MongoClient
+    col = MongoClient(args.mongo_uri)[DB_NAME][SHADOW_COLLECTION]
+    query = {}
+    if args.since_hours:
+        query["time"] = {"$gte": datetime.utcnow() - timedelta(hours=args.since_hours)}
+    if args.model:
+        query["shadow_model"] = args.model
+    projection = {"_id": 0, "live_prob": 1, "shadow_prob": 1, "live_ms": 1, "shadow_ms": 1, "shadow_error": 1}
+    s = summarise(list(col.find(query, projection)), args.threshold)
+    if not s["total"]:
+        print("[INFO] No shadow scores recorded yet.")
+        return
+    print("================ Shadow model report ================")
+    print(f"Scored pairs         : {s['scored']} (of {s['total']}, {s['shadow_errors']} shadow errors)")
+    print(f"Agreement @ {s['threshold']:.2f}    : {s['agreement']*100:.2f}%")
+    print(f"Flagged by both      : {s['flagged_by_both']}")
+    print(f"Flips live-only      : {s['flips_live_only']}  (live blocks, shadow would allow)")
+    print(f"Flips shadow-only    : {s['flips_shadow_only']}  (shadow would block, live allows)")
+    print(f"Mean |live - shadow| : {s['mean_abs_diff']:.4f}")
+    print(f"Live latency   p50/p99: {s['live_p50_ms']:.2f} / {s['live_p99_ms']:.2f} ms")
+    print(f"Shadow latency p50/p99: {s['shadow_p50_ms']:.2f} / {s['shadow_p99_ms']:.2f} ms")
+
+def main():
+    ap = argparse.ArgumentParser(description="Shadow model comparison")
+    sub = ap.add_subparsers(dest="cmd")
+    rp = sub.add_parser("report", help="summarise live vs shadow scores")
+    rp.add_argument("--mongo-uri", default=MONGO_URI)
+    rp.add_argument("--threshold", type=float, default=FLAG_THRESHOLD)
+    rp.add_argument("--since-hours", type=float, default=0, help="only include recent scores (0 = all)")
+    rp.add_argument("--model", default="", help="only include scores from this shadow model path")
+    args = ap.parse_args()
+    if args.cmd != "report":
+        ap.print_help()
+        sys.exit(1)
+    report(args)
+
+if __name__ == "__main__":
+    main()
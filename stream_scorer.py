@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+stream_scorer.py
+
+Long-running scorer for a feed of raw transactions (e.g. dumped by a payment gateway).
+
+- Input: one append-only JSONL file, or a spool directory whose *.jsonl files are
+  processed in name order (the newest one is tailed). Each line is one raw
+  transaction with the DATASET.csv columns.
+- Pipeline: reader -> bounded queue -> batch scorer -> bounded queue -> bulk writer.
+  When MongoDB or scoring falls behind, the queues fill and the reader stops
+  reading (backpressure) instead of buffering without limit.
+- Scoring uses the same pipeline bundle as app.py (pipeline.encode_row + the model),
+  one predict_proba call per batch.
+- Results go to `stream_scores` with insert_many; transactions at or above the
+  block threshold are also written to `fraud_logs` and folded into the
+  analytics rollups (analytics.rollup_ops).
+- At-least-once: the byte offset of each input file is checkpointed only after
+  the batch containing it has been written. Score and fraud_log _ids are derived
+  from file + offset, so a replay after a crash does not duplicate those documents.
+- Prints sustained events/s and queue depths every --report-seconds.
+
+Usage:
+    python stream_scorer.py --input /var/spool/transactions/
+    python stream_scorer.py --input gateway.jsonl --batch-size 500 --backend hist_gb
+"""
+import os
+import json
+import time
+import glob
+import queue
+import signal
+import argparse
+import threading
+from datetime import datetime
+
+from pymongo import errors
+
+from mongo_conn import make_client
+from pipeline import BLOCK_THRESHOLD, DEFAULT_BACKEND, bundle_path, load_bundle, encode_row
+from analytics import ROLLUPS_COL, ensure_indexes, rollup_ops
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MONGO_URI = "mongodb://localhost:27017/"
+DB_NAME = "fraud_detection_db"
+SCORES_COL = "stream_scores"
+FRAUD_LOGS_COL = "fraud_logs"
+CHECKPOINT_PATH = os.path.join(BASE_DIR, "stream_checkpoint.json")
+
+INPUT_QUEUE_SIZE = 10000   # raw events waiting to be scored
+OUTPUT_QUEUE_SIZE = 20     # scored batches waiting to be written
+BATCH_SIZE = 256
+BATCH_WAIT_SECONDS = 0.2
+POLL_SECONDS = 0.5
+WRITE_RETRY_SECONDS = 2.0
+
+_STOP = object()
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.offsets = json.load(f)
+
+    def get(self, source):
+        return self.offsets.get(source, 0)
+
+    def commit(self, offsets):
+        self.offsets.update(offsets)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.offsets, f)
+        os.replace(tmp, self.path)
+
+class StreamScorer:
+    def __init__(self, args):
+        self.args = args
+        self.bundle = load_bundle(bundle_path(args.backend))
+        if self.bundle is None:
+            raise SystemExit(f"[ERROR] No pipeline bundle at {bundle_path(args.backend)}; run train_random_forest.py")
+        db = make_client(args.mongo_uri)[DB_NAME]
+        self.scores_col, self.logs_col, self.rollups_col = db[SCORES_COL], db[FRAUD_LOGS_COL], db[ROLLUPS_COL]
+        ensure_indexes(self.rollups_col)
+        self.checkpoint = Checkpoint(args.checkpoint)
+        self._read_offsets = {}  # file -> offset already enqueued (ahead of the checkpoint)
+        self.in_q = queue.Queue(maxsize=args.queue_size)
+        self.out_q = queue.Queue(maxsize=OUTPUT_QUEUE_SIZE)
+        self.stop = threading.Event()
+        self.read_count = self.scored = self.alerts = self.bad_lines = 0
+
+    # READER
+    def sources(self):
+        path = self.args.input
+        if os.path.isdir(path):
+            return sorted(os.path.abspath(p) for p in glob.glob(os.path.join(path, "*.jsonl")))
+        return [os.path.abspath(path)] if os.path.exists(path) else []
+
+    def read_loop(self):
+        while not self.stop.is_set():
+            progressed = False
+            for src in self.sources():
+                # finished spool files cost one stat() each: their offset is already at EOF
+                progressed |= self.read_file(src)
+                if self.stop.is_set():
+                    break
+            if not progressed:
+                time.sleep(POLL_SECONDS)
+        self.in_q.put(_STOP)
+
+    def read_file(self, src):
+        """Enqueue complete lines past the last enqueued offset; True if anything was read."""
+        start = self._read_offsets.get(src, self.checkpoint.get(src))
+        if os.path.getsize(src) <= start:
+            return False
+        with open(src, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial line still being written
+                offset += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    self.bad_lines += 1
+                    event = None
+                # blocks when the scorer is behind: this is the backpressure point
+                self.in_q.put((src, offset, event))
+                self.read_count += 1
+                if self.stop.is_set():
+                    break
+        self._read_offsets[src] = offset
+        return offset > start
+
+    # SCORER
+    def score_loop(self):
+        done = False
+        try:
+            while not done:
+                batch = []
+                deadline = time.monotonic() + BATCH_WAIT_SECONDS
+                while len(batch) < self.args.batch_size:
+                    try:
+                        item = self.in_q.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        done = True
+                        break
+                    batch.append(item)
+                if batch:
+                    self.out_q.put(self.score_batch(batch))
+        except Exception as e:
+            # the failed batch is never checkpointed, so it is re-read on restart
+            print(f"[ERROR] Scoring failed, stopping: {e}")
+            self.stop.set()
+        finally:
+            self.out_q.put(_STOP)
+
+    def score_batch(self, batch):
+        import pandas as pd
+        valid, rows = [], []
+        for src, off, ev in batch:
+            if not isinstance(ev, dict):
+                if ev is not None:  # JSON, but not an object (unparsable lines were counted by the reader)
+                    self.bad_lines += 1
+                continue
+            try:
+                row = encode_row(self.bundle, ev)
+                amount = float(ev.get("Transaction_Amount", 0) or 0)
+            except (ValueError, TypeError, OverflowError):
+                # valid JSON but unencodable (e.g. "IP_Address_Flagged": "yes"): skip it like an
+                # unparsable line - its offset still advances, so it cannot wedge the daemon
+                self.bad_lines += 1
+                continue
+            rows.append(row)
+            valid.append((src, off, ev, amount))
+        probs = []
+        if valid:
+            X = pd.DataFrame(rows, columns=self.bundle["feature_columns"])
+            probs = self.bundle["model"].predict_proba(X)[:, 1]
+        now = datetime.utcnow()
+        scores, logs, rollups = [], [], []
+        for (src, off, ev, amount), p in zip(valid, probs):
+            p = float(p)
+            doc_id = f"{os.path.basename(src)}:{off}"
+            scores.append({
+                "_id": doc_id,
+                "transaction_id": ev.get("Transaction_ID"),
+                "user_id": ev.get("User_ID"),
+                "amount": amount,
+                "fraud_prob": p,
+                "blocked": p >= BLOCK_THRESHOLD,
+                "backend": self.bundle.get("backend"),
+                "time": now,
+            })
+            if p >= BLOCK_THRESHOLD:
+                logs.append({
+                    "_id": doc_id,
+                    "user_id": ev.get("User_ID"),
+                    "location": ev.get("Location"),
+                    "amount": amount,
+                    "model_fraud_prob": p,
+                    "source": "stream",
+                    "time": now,
+                })
+                rollups.extend(rollup_ops(ev.get("User_ID"), ev.get("Location"), amount, p, now))
+        # highest offset per file in this batch (lines are in order), including unparsable ones
+        offsets = {}
+        for src, off, _ in batch:
+            offsets[src] = off
+        return scores, logs, rollups, offsets
+
+    # WRITER
+    def _insert(self, col, docs):
+        try:
+            col.insert_many(docs, ordered=False)
+        except errors.BulkWriteError as bwe:
+            # duplicate _ids are replays of already-written events (at-least-once)
+            if any(e.get("code") != 11000 for e in bwe.details.get("writeErrors", [])):
+                raise
+
+    def write_loop(self):
+        while True:
+            item = self.out_q.get()
+            if item is _STOP:
+                return
+            scores, logs, rollups, offsets = item
+            while True:
+                try:
+                    if scores:
+                        self._insert(self.scores_col, scores)
+                    if logs:
+                        self._insert(self.logs_col, logs)
+                    if rollups:
+                        self.rollups_col.bulk_write(rollups, ordered=False)
+                    break
+                except Exception as e:
+                    # keep the batch; upstream queues fill and the reader pauses
+                    print(f"[WARN] bulk write failed, retrying in {WRITE_RETRY_SECONDS}s: {e}")
+                    if self.stop.wait(WRITE_RETRY_SECONDS):
+                        # stopping during an outage: exit without checkpointing, the batch is re-read on restart
+                        print("[WARN] Stopped with an unwritten batch; it will be replayed on restart")
+                        return
+            self.checkpoint.commit(offsets)
+            self.scored += len(scores)
+            self.alerts += len(logs)
+
+    # MAIN
+    def run(self):
+        threads = [
+            threading.Thread(target=self.read_loop, name="stream-reader", daemon=True),
+            threading.Thread(target=self.score_loop, name="stream-scorer", daemon=True),
+            threading.Thread(target=self.write_loop, name="stream-writer", daemon=True),
+        ]
+        for t in threads:
+            t.start()
+        print(f"[INFO] Scoring {self.args.input} with backend {self.bundle.get('backend')} "
+              f"(schema {self.bundle['schema_checksum'][:12]})")
+        t_start = time.monotonic()
+        last_t, last_scored = t_start, 0
+        while threads[2].is_alive():
+            threads[2].join(timeout=self.args.report_seconds)
+            now = time.monotonic()
+            if now - last_t >= self.args.report_seconds or not threads[2].is_alive():
+                eps = (self.scored - last_scored) / max(now - last_t, 1e-9)
+                print(f"[INFO] {eps:8.1f} events/s | scored {self.scored} | alerts {self.alerts} | "
+                      f"bad lines {self.bad_lines} | queues in={self.in_q.qsize()} out={self.out_q.qsize()}")
+                last_t, last_scored = now, self.scored
+        elapsed = time.monotonic() - t_start
+        print(f"[OK] Stopped after {self.scored} events in {elapsed:.1f}s "
+              f"({self.scored / max(elapsed, 1e-9):.1f} events/s sustained)")
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming fraud scorer for a JSONL feed or spool directory")
+    ap.add_argument("--input", required=True, help="JSONL file or spool directory of *.jsonl files")
+    ap.add_argument("--backend", default=os.environ.get("FRAUD_MODEL_BACKEND", DEFAULT_BACKEND))
+    ap.add_argument("--mongo-uri", default=MONGO_URI)
+    ap.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    ap.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    ap.add_argument("--queue-size", type=int, default=INPUT_QUEUE_SIZE)
+    ap.add_argument("--report-seconds", type=float, default=10.0)
+    args = ap.parse_args()
+
+    scorer = StreamScorer(args)
+
+    def stop(signum, _frame):
+        print("[INFO] Stopping: draining queues and writing the final checkpoint...")
+        scorer.stop.set()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    scorer.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""ShadowScorer must accept candidate models fitted on a DataFrame (feature_names_in_ is an ndarray)."""
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("sklearn")
+from sklearn.ensemble import RandomForestClassifier
+
+from shadow import ShadowScorer
+
+class _Collection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_many(self, docs, ordered=False):
+        self.docs.extend(docs)
+
+def test_shadow_scorer_with_dataframe_fitted_model():
+    X = pd.DataFrame({"a": [0, 1, 0, 1], "b": [1.0, 2.0, 3.0, 4.0]})
+    model = RandomForestClassifier(n_estimators=5, random_state=0).fit(X, [0, 1, 0, 1])
+    col = _Collection()
+
+    scorer = ShadowScorer(model, col, model_path="candidate.pkl", workers=1)
+    assert scorer._feature_order == ["a", "b"]
+
+    # columns out of order are realigned to the candidate's training order
+    scorer.submit(X[["b", "a"]].iloc[[1]], 0.5, 1.0, {"stage": "test"})
+    scorer.pool.shutdown(wait=True)
+    scorer.flush()
+    assert len(col.docs) == 1
+    assert "shadow_error" not in col.docs[0]
+    assert 0.0 <= col.docs[0]["shadow_prob"] <= 1.0